@@ -0,0 +1,149 @@
+# benchmark/fake_db.py
+import re
+import threading
+
+from common.scheduler import ACCOUNT_COLUMNS
+from common.snapshots import SNAPSHOT_COLUMNS
+
+
+class RoundTrips:
+    """Thread-safe counters of the calls that cost a round trip to the server."""
+
+    def __init__(self):
+        self.counts = {'execute': 0, 'executemany': 0, 'commit': 0, 'rollback': 0, 'ping': 0}
+        self._lock = threading.Lock()
+
+    def add(self, kind):
+        with self._lock:
+            self.counts[kind] += 1
+
+    def total(self):
+        return sum(self.counts.values())
+
+
+class CountingCursor:
+    """Wraps a DB-API cursor and counts execute/executemany calls."""
+
+    def __init__(self, cursor, round_trips):
+        self._cursor = cursor
+        self._round_trips = round_trips
+
+    def execute(self, sql, params=None):
+        self._round_trips.add('execute')
+        return self._cursor.execute(sql, params)
+
+    def executemany(self, sql, seq_params):
+        # mysql.connector sends an INSERT executemany as one multi-row statement
+        self._round_trips.add('executemany')
+        return self._cursor.executemany(sql, seq_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    """Wraps a connection so the ConnectionPool's traffic can be counted, for real or fake servers."""
+
+    def __init__(self, conn, round_trips):
+        self._conn = conn
+        self._round_trips = round_trips
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs), self._round_trips)
+
+    def commit(self):
+        self._round_trips.add('commit')
+        return self._conn.commit()
+
+    def rollback(self):
+        self._round_trips.add('rollback')
+        return self._conn.rollback()
+
+    def ping(self, *args, **kwargs):
+        self._round_trips.add('ping')
+        return self._conn.ping(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class FakeDatabase:
+    """In-memory stand-in for the MySQL schema.
+
+    Writes are accepted and only counted. The influencers table and
+    account_snapshots are kept so the scheduler's due query and the
+    snapshot lookups return realistic results.
+    """
+
+    def __init__(self, influencers=()):
+        self.influencers = list(influencers)  # dicts with influencer_id and the ACCOUNT_COLUMNS
+        self.snapshots = {}
+        self.rows_written = 0
+        self._lock = threading.Lock()
+
+    def connect(self):
+        return FakeConnection(self)
+
+    def query(self, sql, params):
+        """Run one statement and return its result rows."""
+        if 'FROM influencers i' in sql:
+            column = next(c for c in ACCOUNT_COLUMNS.values() if f'i.{c}' in sql)
+            latest = {snapshot['influencer_id']: snapshot
+                      for (platform, _), snapshot in self.snapshots.items() if platform == params[0]}
+            return [(row['influencer_id'], row[column],
+                     latest.get(row['influencer_id'], {}).get('last_updated'),
+                     latest.get(row['influencer_id'], {}).get('refresh_interval'))
+                    for row in self.influencers if row.get(column) is not None]
+        if 'FROM account_snapshots' in sql:
+            snapshot = self.snapshots.get((params[0], params[1]))
+            return [tuple(snapshot[c] for c in SNAPSHOT_COLUMNS)] if snapshot else []
+        if re.match(r'\s*INSERT INTO account_snapshots', sql):
+            with self._lock:
+                self.snapshots[(params[0], params[1])] = dict(zip(SNAPSHOT_COLUMNS, params[2:]))
+        with self._lock:
+            self.rows_written += 1
+        return []
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self._rows = self.db.query(sql, params or ())
+
+    def executemany(self, sql, seq_params):
+        for params in seq_params:
+            self.db.query(sql, params)
+        self._rows = []
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        pass
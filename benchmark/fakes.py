@@ -0,0 +1,264 @@
+# benchmark/fakes.py
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+
+
+class FakeApiError(Exception):
+    """Raised by the fake clients to simulate a failed API call."""
+
+
+class FakeProfile:
+    """Latency, error rate and post count shared by all fake clients of one benchmark run."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, posts=10, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.posts = posts
+        self.seed = seed
+        self.calls = 0
+        self.usernames = {}  # Instagram user ID -> username, for user_info()
+        self._lock = threading.Lock()
+
+    def rng(self, account):
+        # Same account -> same numbers in every run, so runs are comparable
+        return random.Random(f"{self.seed}:{account}")
+
+    def fails(self):
+        return self.error_rate and random.random() < self.error_rate
+
+    def count(self):
+        with self._lock:
+            self.calls += 1
+
+    def call(self, can_fail=True):
+        """Simulate one blocking API call."""
+        self.count()
+        if self.latency:
+            time.sleep(self.latency)
+        if can_fail and self.fails():
+            raise FakeApiError("simulated API error")
+
+    async def call_async(self):
+        """Simulate one API call on the event loop."""
+        self.count()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fails():
+            raise FakeApiError("simulated API error")
+
+
+# --- Instagram -------------------------------------------------------------
+
+class FakeInstagramClient:
+    """Stands in for instagrapi.Client (the three calls fetch_profile_and_posts makes)."""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def user_id_from_username(self, username):
+        self.profile.call()
+        user_id = int(username.rsplit('_', 1)[-1]) + 1
+        self.profile.usernames[user_id] = username
+        return user_id
+
+    def user_info(self, user_id):
+        self.profile.call()
+        rng = self.profile.rng(user_id)
+        return SimpleNamespace(
+            username=self.profile.usernames.get(user_id, str(user_id)),
+            follower_count=rng.randint(1000, 5000000),
+            following_count=rng.randint(0, 2000),
+            media_count=rng.randint(self.profile.posts, 5000),
+            profile_pic_url=f"https://example.com/{user_id}.jpg",
+            biography="benchmark account",
+            external_url=None,
+            is_verified=rng.random() < 0.1,
+            account_type=1,
+        )
+
+    def user_medias_paginated(self, user_id, amount=0, end_cursor=""):
+        self.profile.call()
+        rng = self.profile.rng(user_id)
+        now = datetime.now()
+        start = int(end_cursor or 0)
+        end = min(start + amount, self.profile.posts)
+        medias = [SimpleNamespace(
+            pk=user_id * 1000 + i,
+            taken_at=now - timedelta(days=i),
+            caption_text=f"post {i}",
+            media_type=1,
+            like_count=rng.randint(0, 100000),
+            comment_count=rng.randint(0, 5000),
+        ) for i in range(start, end)]
+        return medias, str(end) if end < self.profile.posts else ""
+
+
+# --- TikTok ----------------------------------------------------------------
+
+class FakeTikTokUser:
+    def __init__(self, profile, username=None, user_id=None, sec_uid=None):
+        self.profile = profile
+        self.username = username
+        self.user_id = user_id
+        self.sec_uid = sec_uid
+
+    async def info(self, session_index=None):
+        """Same response shape as TikTokApi's User.info(), which also fills in user_id and sec_uid."""
+        await self.profile.call_async()
+        rng = self.profile.rng(self.username)
+        self.user_id = f"id_{self.username}"
+        self.sec_uid = f"sec_{self.username}"
+        return {
+            "userInfo": {
+                "user": {"id": self.user_id, "uniqueId": self.username, "nickname": self.username,
+                         "secUid": self.sec_uid},
+                "stats": {"followerCount": rng.randint(1000, 5000000),
+                          "videoCount": rng.randint(self.profile.posts, 3000)},
+            }
+        }
+
+    async def videos(self, count=30, session_index=None):
+        """Yields objects shaped like TikTokApi's Video: id, create_time (datetime), stats and as_dict."""
+        await self.profile.call_async()
+        rng = self.profile.rng(self.user_id)
+        now = time.time()
+        for i in range(min(count, self.profile.posts)):
+            stats = {"playCount": rng.randint(0, 10000000),
+                     "diggCount": rng.randint(0, 500000),
+                     "commentCount": rng.randint(0, 20000)}
+            data = {"id": f"{self.user_id}_v{i}", "desc": f"video {i}",
+                    "createTime": int(now - i * 86400), "stats": stats}
+            yield SimpleNamespace(
+                id=data["id"],
+                create_time=datetime.fromtimestamp(data["createTime"]),
+                stats=stats,
+                as_dict=data,
+            )
+
+
+class FakeTikTokApi:
+    """Stands in for TikTokApi: async context manager with create_sessions() and user()."""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def create_sessions(self, ms_tokens=None, num_sessions=1, sleep_after=0, **kwargs):
+        pass
+
+    def user(self, username=None, user_id=None, sec_uid=None):
+        return FakeTikTokUser(self.profile, username, user_id, sec_uid)
+
+
+# --- YouTube ---------------------------------------------------------------
+
+class FakeRequest:
+    """A prepared API request like googleapiclient's HttpRequest (headers + execute())."""
+
+    def __init__(self, profile, respond, can_fail=False):
+        self.profile = profile
+        self.respond = respond
+        self.can_fail = can_fail
+        self.headers = {}
+
+    def execute(self):
+        self.profile.call(can_fail=False)
+        if self.can_fail and self.profile.fails():
+            raise HttpError(Response({'status': 503}), b'simulated backend error')
+        response = self.respond()
+        response['etag'] = f"etag-{time.monotonic_ns()}"
+        return response
+
+
+class FakeResource:
+    def __init__(self, profile, respond, can_fail=False):
+        self.profile = profile
+        self._respond = respond
+        self.can_fail = can_fail
+
+    def list(self, **kwargs):
+        return FakeRequest(self.profile, lambda: self._respond(**kwargs), self.can_fail)
+
+
+class FakeYouTube:
+    """Stands in for the googleapiclient youtube v3 client.
+
+    The error rate fails whole channels.list calls with an HttpError 503
+    and drops single channels from the responses, which the scraper treats
+    as "channel not found".
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def channels(self):
+        return FakeResource(self.profile, self._channels, can_fail=True)
+
+    def playlistItems(self):
+        return FakeResource(self.profile, self._playlist_items)
+
+    def search(self):
+        return FakeResource(self.profile, self._search)
+
+    def videos(self):
+        return FakeResource(self.profile, self._videos)
+
+    def _channels(self, id, **kwargs):
+        items = []
+        for channel_id in id.split(','):
+            if self.profile.fails():
+                continue
+            rng = self.profile.rng(channel_id)
+            items.append({
+                'id': channel_id,
+                'snippet': {'title': f"Channel {channel_id}"},
+                'statistics': {'subscriberCount': str(rng.randint(1000, 5000000)),
+                               'viewCount': str(rng.randint(10 ** 5, 10 ** 9)),
+                               'videoCount': str(rng.randint(self.profile.posts, 3000))},
+            })
+        return {'items': items}
+
+    def _video_page(self, channel_id, max_results, page_token):
+        """IDs of one page (newest first) and the token of the next page, if any."""
+        start = int(page_token or 0)
+        end = min(start + max_results, self.profile.posts)
+        return [f"{channel_id}_v{i}" for i in range(start, end)], str(end) if end < self.profile.posts else None
+
+    def _playlist_items(self, playlistId, maxResults=5, pageToken=None, **kwargs):
+        video_ids, next_page = self._video_page('UC' + playlistId[2:], maxResults, pageToken)
+        response = {'items': [{'contentDetails': {'videoId': video_id}} for video_id in video_ids]}
+        if next_page:
+            response['nextPageToken'] = next_page
+        return response
+
+    def _search(self, channelId, maxResults=5, pageToken=None, **kwargs):
+        video_ids, next_page = self._video_page(channelId, maxResults, pageToken)
+        response = {'items': [{'id': {'kind': 'youtube#video', 'videoId': video_id}} for video_id in video_ids]}
+        if next_page:
+            response['nextPageToken'] = next_page
+        return response
+
+    def _videos(self, id, **kwargs):
+        items = []
+        for video_id in id.split(','):
+            rng = self.profile.rng(video_id)
+            items.append({
+                'id': video_id,
+                'snippet': {'title': f"Video {video_id}"},
+                'statistics': {'viewCount': str(rng.randint(0, 10 ** 7)),
+                               'likeCount': str(rng.randint(0, 500000)),
+                               'commentCount': str(rng.randint(0, 20000))},
+            })
+        return {'items': items}
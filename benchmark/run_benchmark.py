@@ -0,0 +1,171 @@
+# benchmark/run_benchmark.py
+"""Offline throughput benchmark for the scrapers.
+
+Runs one refresh cycle of each scraper's real monitor loop against fake
+Instagram/TikTok/YouTube clients and an in-memory database stand-in (or a
+local MySQL scratch database with --mysql), then reports influencers per
+second, database round trips per influencer and peak Python memory.
+
+    py benchmark/run_benchmark.py
+    py benchmark/run_benchmark.py --platforms tiktok --sizes 1000 --latency 0.05 --error-rate 0.02
+"""
+import sys
+import os
+import argparse
+import asyncio
+import contextlib
+import tempfile
+import time
+import tracemalloc
+
+# Allow running as a script: python benchmark/run_benchmark.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.db import ConnectionPool, get_db_connection
+from common.cache import Cache
+from common.media_cursors import MediaCursors
+from common.identity_cache import IdentityCache
+from common.spool import Spool
+from common.instrumentation import get_instrumentation
+from common.rate_limit import TokenBucket
+from common.scheduler import ACCOUNT_COLUMNS
+from common.config import INSTAGRAM_WORKERS, TIKTOK_CONCURRENCY
+from benchmark.fakes import FakeProfile, FakeInstagramClient, FakeTikTokApi, FakeYouTube
+from benchmark.fake_db import FakeDatabase, RoundTrips, CountingConnection
+
+PLATFORMS = ('instagram', 'tiktok', 'youtube')
+
+
+def account_name(platform, run_id, i):
+    if platform == 'youtube':
+        return f"UCbench{run_id}_{i}"
+    return f"bench{run_id}_{platform[:2]}_{i}"
+
+
+def seed_mysql(platform, accounts):
+    """Insert the synthetic accounts into the influencers table of the configured database."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    column = ACCOUNT_COLUMNS[platform]
+    for i in range(0, len(accounts), 1000):
+        cursor.executemany(f"INSERT IGNORE INTO influencers ({column}) VALUES (%s)",
+                           [(account,) for account in accounts[i:i + 1000]])
+    conn.commit()
+    conn.close()
+
+
+def tmp_spool(tmp_dir):
+    """Spool factory for the scrapers, so a run never replays or acknowledges the real spool."""
+    return lambda name: Spool(name, os.path.join(tmp_dir, 'spool'))
+
+
+def run_instagram(profile, pool, tmp_dir):
+    from instagram import instagram_scraper
+    from common.instagram_sessions import InstagramSessionPool
+
+    session_pool = InstagramSessionPool([(f"bench{i}", '') for i in range(INSTAGRAM_WORKERS)], tmp_dir)
+    for session in session_pool.sessions:
+        session.client = FakeInstagramClient(profile)
+        session.bucket = TokenBucket(10 ** 9)  # Measure the code, not the configured request budget
+    instagram_scraper.session_pool = session_pool
+    instagram_scraper.media_cursors = MediaCursors('instagram', os.path.join(tmp_dir, 'media_cursors.sqlite3'))
+    instagram_scraper.identities = IdentityCache('instagram', os.path.join(tmp_dir, 'identities.sqlite3'))
+    instagram_scraper.get_pool = lambda: pool
+    instagram_scraper.Spool = tmp_spool(tmp_dir)
+    instagram_scraper.monitor_and_update_data(max_cycles=1)
+
+
+def run_tiktok(profile, pool, tmp_dir, sessions=TIKTOK_CONCURRENCY):
+    from tiktok import tiktok_scraper
+
+    tiktok_scraper.TikTokApi = lambda: FakeTikTokApi(profile)
+    tiktok_scraper.ms_tokens = ['bench'] * sessions
+    tiktok_scraper.media_cursors = MediaCursors('tiktok', os.path.join(tmp_dir, 'media_cursors.sqlite3'))
+    tiktok_scraper.identities = IdentityCache('tiktok', os.path.join(tmp_dir, 'identities.sqlite3'))
+    tiktok_scraper.get_pool = lambda: pool
+    tiktok_scraper.Spool = tmp_spool(tmp_dir)
+    asyncio.run(tiktok_scraper.monitor_and_update_tiktok_data(max_cycles=1))
+
+
+def run_youtube(profile, pool, tmp_dir):
+    from youtube import youtube_scraper
+
+    youtube_scraper.youtube = FakeYouTube(profile)
+    youtube_scraper.cache = Cache(os.path.join(tmp_dir, 'youtube_cache.sqlite3'))
+    youtube_scraper.media_cursors = MediaCursors('youtube', os.path.join(tmp_dir, 'media_cursors.sqlite3'))
+    youtube_scraper.get_pool = lambda: pool
+    youtube_scraper.Spool = tmp_spool(tmp_dir)
+    youtube_scraper.monitor_and_update_data(max_cycles=1)
+
+
+RUNNERS = {
+    'instagram': run_instagram,
+    'tiktok': run_tiktok,
+    'youtube': run_youtube,
+}
+
+
+def run(platform, size, args):
+    run_id = f"{int(time.time())}{size}"
+    accounts = [account_name(platform, run_id, i) for i in range(size)]
+    round_trips = RoundTrips()
+    if args.mysql:
+        seed_mysql(platform, accounts)
+        connect = get_db_connection
+    else:
+        db = FakeDatabase({'influencer_id': i + 1, ACCOUNT_COLUMNS[platform]: account}
+                          for i, account in enumerate(accounts))
+        connect = db.connect
+    pool = ConnectionPool(connect=lambda: CountingConnection(connect(), round_trips))
+    profile = FakeProfile(args.latency, args.error_rate, args.posts)
+
+    instrumentation = get_instrumentation()
+    dump_dir = instrumentation.dump_dir
+    with tempfile.TemporaryDirectory() as tmp_dir, open(os.devnull, 'w') as devnull:
+        # Metrics dumps go to the temporary directory instead of replacing the real ones
+        instrumentation.dump_dir = os.path.join(tmp_dir, 'metrics')
+        tracemalloc.start()
+        started = time.perf_counter()
+        # The scrapers print per influencer; keep that work but not the output
+        with contextlib.redirect_stdout(devnull):
+            RUNNERS[platform](profile, pool, tmp_dir)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        instrumentation.dump_dir = dump_dir
+    pool.close_all()
+
+    return {
+        'platform': platform,
+        'influencers': size,
+        'seconds': elapsed,
+        'per_second': size / elapsed if elapsed else 0,
+        'round_trips': round_trips.total() / size,
+        'api_calls': profile.calls / size,
+        'peak_mb': peak / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scraper throughput benchmark")
+    parser.add_argument('--platforms', nargs='+', choices=PLATFORMS, default=list(PLATFORMS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds per fake API call")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of fake API calls that fail")
+    parser.add_argument('--posts', type=int, default=10, help="posts/videos per account")
+    parser.add_argument('--mysql', action='store_true',
+                        help="use the database from DB_CONFIG (an empty scratch database!) instead of the stand-in")
+    args = parser.parse_args()
+
+    print(f"{'platform':<10} {'influencers':>11} {'seconds':>9} {'infl/s':>9} "
+          f"{'db trips/infl':>13} {'api calls/infl':>14} {'peak MB':>8}")
+    for platform in args.platforms:
+        for size in args.sizes:
+            result = run(platform, size, args)
+            print(f"{result['platform']:<10} {result['influencers']:>11} {result['seconds']:>9.2f} "
+                  f"{result['per_second']:>9.1f} {result['round_trips']:>13.2f} "
+                  f"{result['api_calls']:>14.2f} {result['peak_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
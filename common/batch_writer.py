@@ -0,0 +1,132 @@
+# common/batch_writer.py
+import os
+import time
+
+from mysql.connector.errors import DataError, IntegrityError
+from common.cache import dumps
+from common.config import WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, QUARANTINE_DIR
+from common.instrumentation import get_instrumentation
+
+# Errors caused by the rows themselves (out-of-range values, FK violations): retrying the same
+# batch would fail forever, so the rows are written one at a time and the bad ones quarantined
+ROW_ERRORS = (DataError, IntegrityError)
+
+
+class BatchWriter:
+    """Buffers rows per table and writes them with one executemany call per table.
+
+    mysql.connector turns executemany on an INSERT (including
+    ON DUPLICATE KEY UPDATE) into a single multi-row statement, so each
+    flush costs one round trip per table instead of one per row. Tables are
+    flushed in the order of `statements`, so parent tables must come before
+    the history tables that reference them. Each flush runs in its own
+    transaction on a pooled connection, so it must only happen after the
+    parent rows have been committed (see flush_if_due). `on_flush` is
+    called whenever everything added so far has been committed.
+
+    A failed flush keeps the rows buffered for the next one, unless a row
+    itself is bad (ROW_ERRORS): then the rows are written one by one and
+    the failing ones are appended to <QUARANTINE_DIR>/<platform>.jsonl.
+    """
+
+    def __init__(self, pool, statements, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 platform='all', on_flush=None, quarantine_dir=QUARANTINE_DIR):
+        self.pool = pool
+        self.quarantine_path = os.path.join(quarantine_dir, f"{platform}.jsonl")
+        self.platform = platform  # Label of the flush timings in the instrumentation
+        self.on_flush = on_flush
+        self.statements = dict(statements)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = {table: [] for table in self.statements}
+        self._last_flush = time.monotonic()
+        self.stats = {
+            "flushes": 0,
+            "rows": 0,
+            "last_flush_rows": 0,
+            "last_flush_seconds": 0.0,
+            "total_flush_seconds": 0.0,
+            "max_flush_seconds": 0.0,
+            "quarantined": 0,
+        }
+
+    def add(self, table, row):
+        """Queue one parameter tuple for `table`."""
+        self._rows[table].append(row)
+
+    def flush_if_due(self):
+        """Flush if the batch is full or old enough. Call after committing a unit of work."""
+        if (self.pending() >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            return self.flush()
+        return 0
+
+    def pending(self):
+        return sum(len(rows) for rows in self._rows.values())
+
+    def flush(self):
+        """Write and commit all buffered rows."""
+        rows_written = self.pending()
+        self._last_flush = time.monotonic()
+        if not rows_written:
+            if self.on_flush:
+                self.on_flush()
+            return 0
+
+        start = time.perf_counter()
+        try:
+            with self.pool.cursor() as cursor:
+                for table, sql in self.statements.items():
+                    rows = self._rows[table]
+                    if rows:
+                        cursor.executemany(sql, rows)
+        except ROW_ERRORS as e:
+            print(f"Batch write failed ({e}), writing {rows_written} rows one at a time")
+            with self.pool.cursor() as cursor:
+                rows_written -= self._write_rows(cursor)
+        self._rows = {table: [] for table in self.statements}
+        elapsed = time.perf_counter() - start
+
+        self.stats["flushes"] += 1
+        self.stats["rows"] += rows_written
+        self.stats["last_flush_rows"] = rows_written
+        self.stats["last_flush_seconds"] = elapsed
+        self.stats["total_flush_seconds"] += elapsed
+        self.stats["max_flush_seconds"] = max(self.stats["max_flush_seconds"], elapsed)
+        get_instrumentation().observe('stage_seconds', self.platform, 'flush', elapsed)
+        print(f"Flushed {rows_written} rows in {elapsed * 1000:.1f} ms")
+        if self.on_flush:
+            self.on_flush()
+        return rows_written
+
+    def _write_rows(self, cursor):
+        """Write the buffered rows one by one, quarantining the bad ones; returns how many were quarantined.
+
+        MySQL only rolls back the failing statement, so the good rows still
+        commit together; connection errors abort the transaction as usual.
+        """
+        quarantined = []
+        for table, sql in self.statements.items():
+            for row in self._rows[table]:
+                try:
+                    cursor.execute(sql, row)
+                except ROW_ERRORS as e:
+                    quarantined.append({'table': table, 'row': list(row), 'error': str(e)})
+        if quarantined:
+            os.makedirs(os.path.dirname(self.quarantine_path) or '.', exist_ok=True)
+            with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+                for record in quarantined:
+                    f.write(dumps(record) + "\n")
+            print(f"Quarantined {len(quarantined)} rows in {self.quarantine_path}")
+            self.stats["quarantined"] += len(quarantined)
+            get_instrumentation().count('quarantined', self.platform, len(quarantined))
+        return len(quarantined)
+
+    def report(self):
+        """Return a one-line summary of the write counters."""
+        flushes = self.stats["flushes"]
+        avg_rows = self.stats["rows"] / flushes if flushes else 0
+        avg_ms = self.stats["total_flush_seconds"] / flushes * 1000 if flushes else 0
+        return (f"{flushes} flushes, {self.stats['rows']} rows, {avg_rows:.1f} rows/flush, "
+                f"avg {avg_ms:.1f} ms, max {self.stats['max_flush_seconds'] * 1000:.1f} ms, "
+                f"{self.stats['quarantined']} quarantined")
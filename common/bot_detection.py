@@ -0,0 +1,164 @@
+# common/bot_detection.py
+import sys
+import os
+import time
+
+import numpy as np
+
+# Allow running as a script: python common/bot_detection.py --backfill
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.config import BOT_WINDOW, BOT_MIN_POINTS, BOT_Z_THRESHOLD, BOT_GROWTH_OUTLIER
+from common.snapshots import percent_change
+
+# Profile history table, account column, time column and follower column per platform
+HISTORY_TABLES = {
+    'instagram': ('instagram_influencer_data_history', 'influencer_id', 'timestamp', 'followers_count'),
+    'tiktok': ('tiktok_profile_history', 'user_id', 'last_updated', 'follower_count'),
+    'youtube': ('youtube_channel_history', 'channel_id', 'last_updated', 'subscriber_count'),
+}
+
+# Minimum standard deviation (percentage points) so flat histories don't turn tiny changes into huge z-scores
+MIN_STD = 1.0
+
+# Rows per UPDATE ... WHERE id IN (...) statement during backfills
+UPDATE_CHUNK = 1000
+
+
+def group_starts(codes):
+    """Index of the first row of each row's group; rows of a group must be contiguous."""
+    idx = np.arange(len(codes))
+    is_start = np.ones(len(codes), dtype=bool)
+    is_start[1:] = codes[1:] != codes[:-1]
+    return np.maximum.accumulate(np.where(is_start, idx, 0))
+
+
+def pct_change(values, starts):
+    """Percent change to the previous row of the same group (0 for first rows and zero bases)."""
+    idx = np.arange(len(values))
+    prev = np.empty_like(values)
+    prev[0] = 0
+    prev[1:] = values[:-1]
+    valid = (idx > starts) & (prev > 0)
+    change = np.zeros(len(values))
+    np.divide(values - prev, prev, out=change, where=valid)
+    return change * 100, valid
+
+
+def rolling_zscores(values, valid, starts, window=BOT_WINDOW, min_points=BOT_MIN_POINTS):
+    """z-score of each value against the previous `window` valid values of the same group."""
+    idx = np.arange(len(values))
+    x = np.where(valid, values, 0.0)
+    c0 = np.concatenate(([0], np.cumsum(valid)))
+    c1 = np.concatenate(([0.0], np.cumsum(x)))
+    c2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    lo = np.minimum(np.maximum(starts, idx - window), idx)
+    count = c0[idx] - c0[lo]
+    safe_count = np.maximum(count, 1)
+    mean = (c1[idx] - c1[lo]) / safe_count
+    var = (c2[idx] - c2[lo]) / safe_count - mean ** 2
+    std = np.maximum(np.sqrt(np.maximum(var, 0.0)), MIN_STD)
+    z = (values - mean) / std
+    z[(count < min_points) | ~valid] = 0.0
+    return z
+
+
+def score(codes, followers, engagement, window=BOT_WINDOW, min_points=BOT_MIN_POINTS,
+          z_threshold=BOT_Z_THRESHOLD, growth_outlier=BOT_GROWTH_OUTLIER):
+    """Score every snapshot row in one vectorized pass.
+
+    Rows must be grouped by account code and ordered by time within each
+    group. A row is flagged if follower growth or engagement growth is a
+    rolling z-score outlier, or if followers grew by more than
+    `growth_outlier` percent since the previous snapshot.
+    """
+    starts = group_starts(codes)
+    growth, growth_valid = pct_change(followers.astype(float), starts)
+    engagement_growth, engagement_valid = pct_change(engagement.astype(float), starts)
+    z_growth = rolling_zscores(growth, growth_valid, starts, window, min_points)
+    z_engagement = rolling_zscores(engagement_growth, engagement_valid, starts, window, min_points)
+    flags = ((z_growth > z_threshold) | (z_engagement > z_threshold)
+             | (growth_valid & (growth > growth_outlier)))
+    return flags, z_growth, z_engagement
+
+
+def to_arrays(rows):
+    """Turn (account, followers, likes, comments, ...) rows into account codes and value arrays."""
+    if not rows:
+        empty = np.array([], dtype=float)
+        return np.array([], dtype=int), [], empty, empty
+    columns = list(zip(*rows))
+    accounts, codes = np.unique(np.array(columns[0], dtype=object).astype(str), return_inverse=True)
+    followers = np.array(columns[1], dtype=float)
+    engagement = np.array(columns[2], dtype=float) + np.array(columns[3], dtype=float)
+    return codes, accounts, np.nan_to_num(followers), np.nan_to_num(engagement)
+
+
+class BotDetector:
+    """Rolling-statistics bot detection over a platform's profile history table."""
+
+    def __init__(self, platform, window=BOT_WINDOW):
+        self.platform = platform
+        self.window = window
+        self.table, self.account_column, self.time_column, self.followers_column = HISTORY_TABLES[platform]
+
+    def detect_snapshot(self, snapshot, followers, total_likes, total_comments):
+        """Score a fresh snapshot against the rolling baseline stored in account_snapshots (no query)."""
+        if not snapshot:
+            return False
+        growth = percent_change(snapshot['followers_count'], followers)
+        if growth is not None and growth > BOT_GROWTH_OUTLIER:
+            return True
+        if snapshot['samples'] < BOT_MIN_POINTS:
+            return False
+        engagement = percent_change((snapshot['total_likes'] or 0) + (snapshot['total_comments'] or 0),
+                                    (total_likes or 0) + (total_comments or 0))
+        for value, mean, var in ((growth, snapshot['growth_mean'], snapshot['growth_var']),
+                                 (engagement, snapshot['engagement_mean'], snapshot['engagement_var'])):
+            if value is not None and (value - mean) / max(float(var) ** 0.5, MIN_STD) > BOT_Z_THRESHOLD:
+                return True
+        return False
+
+    def backfill(self, cursor):
+        """Re-score every history row and update bot_flag where it changed. Returns rows changed."""
+        started = time.perf_counter()
+        cursor.execute(f"""
+            SELECT {self.account_column}, {self.followers_column}, total_likes, total_comments, id, bot_flag
+            FROM {self.table}
+            ORDER BY {self.account_column}, {self.time_column}, id
+        """)
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        codes, _, followers, engagement = to_arrays(rows)
+        ids = np.array([row[4] for row in rows])
+        old_flags = np.array([bool(row[5]) for row in rows])
+        flags, _, _ = score(codes, followers, engagement, self.window)
+
+        changed = flags != old_flags
+        for flag in (True, False):
+            target = ids[changed & (flags == flag)].tolist()
+            for i in range(0, len(target), UPDATE_CHUNK):
+                chunk = target[i:i + UPDATE_CHUNK]
+                cursor.execute(
+                    f"UPDATE {self.table} SET bot_flag = %s WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                    (int(flag), *chunk)
+                )
+        print(f"Re-scored {len(rows)} {self.platform} history rows in {time.perf_counter() - started:.1f}s, "
+              f"{int(flags.sum())} flagged, {int(changed.sum())} changed")
+        return int(changed.sum())
+
+
+def backfill_all(platforms=tuple(HISTORY_TABLES)):
+    from common.db import get_pool
+
+    with get_pool().cursor() as cursor:
+        for platform in platforms:
+            BotDetector(platform).backfill(cursor)
+
+
+if __name__ == "__main__":
+    if '--backfill' in sys.argv:
+        backfill_all([arg for arg in sys.argv[1:] if arg in HISTORY_TABLES] or tuple(HISTORY_TABLES))
+    else:
+        print("Usage: python common/bot_detection.py --backfill [instagram|tiktok|youtube ...]")
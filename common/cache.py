@@ -0,0 +1,159 @@
+# common/cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime
+
+from common.config import CACHE_DEFAULT_TTL, CACHE_MAX_ENTRIES
+
+# Expired and least recently used entries are pruned every this many writes
+EVICT_EVERY = 100
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode_hook(obj):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def dumps(value):
+    """Serialize a value as compact JSON; datetimes and dates are tagged so loads() restores them."""
+    return json.dumps(value, default=_encode_default, separators=(',', ':'))
+
+
+def loads(text):
+    return json.loads(text, object_hook=_decode_hook)
+
+
+def encode(value):
+    """Serialize a value as zlib-compressed JSON."""
+    return zlib.compress(dumps(value).encode('utf-8'))
+
+
+def decode(blob):
+    return loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class Cache:
+    """Persistent key-value cache with TTL and LRU eviction, backed by SQLite.
+
+    SQLite's WAL mode lets several processes read while one writes, so the
+    same cache file can be shared by multiple scraper workers. Values must
+    be JSON serializable (datetimes are supported); tuples come back as lists.
+    The file is only created on first use, so module-level caches cost
+    nothing when a module is merely imported.
+    """
+
+    def __init__(self, path, ttl=CACHE_DEFAULT_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        self._created = False
+
+    def _create(self, conn):
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                if not self._created:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                conn = sqlite3.connect(self.path, timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                if not self._created:
+                    self._create(conn)
+                    self._created = True
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def get(self, key, default=None):
+        conn = self._connection()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            self._count("misses")
+            return default
+        if row[1] <= now:
+            with conn:
+                conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, now))
+            self._count("misses")
+            self._count("expired")
+            return default
+        with conn:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return decode(row[0])
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, encode(value), now + ttl, now),
+            )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def delete(self, key):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above max_entries."""
+        conn = self._connection()
+        with conn:
+            expired = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            evicted = conn.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,)).rowcount
+        self._count("expired", expired)
+        self._count("evictions", evicted)
+        return expired + evicted
+
+    def report(self):
+        """Return a one-line summary of the cache counters."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups * 100 if lookups else 0
+        return (f"{self.stats['hits']} hits, {self.stats['misses']} misses ({hit_rate:.1f}% hit rate), "
+                f"{self.stats['evictions']} evicted, {self.stats['expired']} expired")
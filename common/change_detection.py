@@ -0,0 +1,79 @@
+# common/change_detection.py
+from collections import OrderedDict
+
+from common.config import CHANGE_DETECTION, CHANGE_CACHE_MAX_ENTRIES
+from common.instrumentation import get_instrumentation
+
+# All detectors of the process, so a transaction can commit or discard their staged values
+_detectors = []
+
+
+class ChangeDetector:
+    """Remembers the last written counters per entity so unchanged history rows can be skipped.
+
+    The map lives in memory (least recently seen entities are dropped
+    beyond max_entries), so the comparison costs no query. After a restart
+    the first refresh of every entity is written again. New values are only
+    staged until their transaction commits (commit_changes), and dropped if
+    it rolls back (discard_changes), so a failed write is not mistaken for
+    an unchanged one later. Not thread-safe: use it from the thread that
+    writes to the database.
+    """
+
+    def __init__(self, platform, entity, enabled=CHANGE_DETECTION, max_entries=CHANGE_CACHE_MAX_ENTRIES):
+        self.platform = platform
+        self.entity = entity
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._last = OrderedDict()
+        self._staged = {}
+        self.written = 0
+        self.suppressed = 0
+        _detectors.append(self)
+
+    def changed(self, key, *values):
+        """True if `values` differ from the last ones recorded for `key` (and record them)."""
+        if not self.enabled:
+            return True
+        last = self._staged[key] if key in self._staged else self._last.get(key)
+        if last == values:
+            if key in self._last:
+                self._last.move_to_end(key)
+            self.suppressed += 1
+            get_instrumentation().count(f'{self.entity}_history_suppressed', self.platform)
+            return False
+        self._staged[key] = values
+        self.written += 1
+        get_instrumentation().count(f'{self.entity}_history_written', self.platform)
+        return True
+
+    def commit(self):
+        """Remember the values staged since the last commit; call after their transaction committed."""
+        for key, values in self._staged.items():
+            self._last[key] = values
+            self._last.move_to_end(key)
+        while len(self._last) > self.max_entries:
+            self._last.popitem(last=False)
+        self._staged = {}
+
+    def discard(self):
+        """Forget the staged values; call when their transaction rolled back."""
+        self._staged = {}
+
+    def report(self):
+        """Return the written/suppressed counts since the last report and reset them."""
+        summary = f"{self.entity} history {self.written} written, {self.suppressed} unchanged skipped"
+        self.written = self.suppressed = 0
+        return summary
+
+
+def commit_changes():
+    """Commit the staged values of all detectors (after a successful transaction)."""
+    for detector in _detectors:
+        detector.commit()
+
+
+def discard_changes():
+    """Drop the staged values of all detectors (after a rolled back transaction)."""
+    for detector in _detectors:
+        detector.discard()
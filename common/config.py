@@ -1,4 +1,9 @@
 # config.py
+import os
+
+# Local state (caches, spools, sessions, metrics dumps) lives here, independent of the working
+# directory the scrapers are started from; defaults to the repository root
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Database connection configuration
 DB_CONFIG = {
@@ -7,15 +12,111 @@ DB_CONFIG = {
     'password': 'password',
     'database': 'database'
 }
+DB_POOL_SIZE = 5  # Maximum number of pooled connections per process
+DB_POOL_TIMEOUT = 30  # Seconds to wait for a free connection before giving up
+
+# Batched writes: rows are flushed once this many are buffered or after this many seconds
+WRITE_BATCH_SIZE = 500
+WRITE_FLUSH_INTERVAL = 30
+
+# Local API response cache (common/cache.py)
+CACHE_DEFAULT_TTL = 3 * 24 * 3600  # Seconds
+CACHE_MAX_ENTRIES = 50000
+YOUTUBE_CACHE_FILE = os.path.join(DATA_DIR, 'youtube_cache.sqlite3')  # ETags and responses of the YouTube API
+
+# Bot detection (common/bot_detection.py)
+BOT_WINDOW = 10  # Previous snapshots used for the rolling statistics
+BOT_MIN_POINTS = 3  # Snapshots needed before z-scores are used
+BOT_Z_THRESHOLD = 4.0  # Flag growth more than this many standard deviations above the rolling mean
+BOT_GROWTH_OUTLIER = 50.0  # Flag follower growth above this many percent between two snapshots
+
+# History retention (common/retention.py)
+HISTORY_RETENTION_DAYS = 30  # Full-resolution rows are kept this long
+HISTORY_ROLLUP_PERIOD = 'day'  # Older rows are rolled up per 'day' or 'week'
+RETENTION_CHUNK_SIZE = 5000  # Rows compacted per transaction
+RETENTION_CHUNK_PAUSE = 0.5  # Seconds between chunks
 
 # Instagram configuration
 INSTAGRAM_USERNAME = "INSTAGRAM_USERNAME"
 INSTAGRAM_PASSWORD = "INSTAGRAM_PASSWORD?!!"
+# Accounts used in rotation, as (username, password) pairs
+INSTAGRAM_ACCOUNTS = [
+    (INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD),
+]
+INSTAGRAM_SESSION_DIR = os.path.join(DATA_DIR, 'sessions')  # Saved instagrapi session settings, one file per account
+INSTAGRAM_ACCOUNT_COOLDOWN = 1800  # Seconds an account rests after a challenge or rate limit
+INSTAGRAM_REQUESTS_PER_MINUTE = 30  # Request budget per logged-in account
+INSTAGRAM_WORKERS = 4  # Fetch threads; concurrency is also bounded by the number of accounts
 
 #Youtube configuration
 YOUTUBE_API_KEY = 'YOUTUBE_API_KEY'
+YOUTUBE_FETCH_MODE = 'playlist'  # 'playlist' (1 unit per call) or 'search' (100 units per call)
+YOUTUBE_DAILY_QUOTA = 10000  # Quota units per API key and day
+# Discovery document the YouTube client is built from; None uses the copy bundled with google-api-python-client
+YOUTUBE_DISCOVERY_FILE = None
 
 #TikTok configuration
 TIKTOK_MSTOKEN = 'TIKTOK_MSTOKEN'
+# Names of the environment variables holding the ms_tokens, one TikTok session per token
+TIKTOK_MSTOKENS = [TIKTOK_MSTOKEN]
+TIKTOK_CONCURRENCY = 4  # Influencers fetched at the same time
+TIKTOK_RATE_LIMIT_BACKOFF = 30  # Seconds a session pauses after its first rate limit, doubled on repeats
+TIKTOK_MAX_ATTEMPTS = 3
+
+# Adaptive refresh intervals (seconds): volatile accounts towards the minimum, quiet ones towards the maximum
+REFRESH_BASE_INTERVAL = 24 * 3600
+REFRESH_MIN_INTERVAL = 2 * 3600
+REFRESH_MAX_INTERVAL = 72 * 3600
+# Maximum refreshes per day per platform; intervals are stretched evenly when the schedule would exceed it
+REFRESH_BUDGETS = {'instagram': None, 'tiktok': None, 'youtube': None}
+
+# Impact score: weights of the components (sum 1), factor for bot-flagged accounts and
+# share of the other platforms' scores added to an influencer's best platform
+IMPACT_WEIGHTS = {'reach': 0.5, 'engagement': 0.3, 'growth': 0.2}
+IMPACT_BOT_PENALTY = 0.5
+IMPACT_CROSS_PLATFORM_BONUS = 0.25
+IMPACT_RANK_INTERVAL = 300  # Seconds between recomputing the stored leaderboard ranks
+IMPACT_LEADERBOARD_SIZE = 100
+
+# Skip history rows whose counters did not change since the last refresh
+CHANGE_DETECTION = True
+CHANGE_CACHE_MAX_ENTRIES = 1000000  # Entities remembered per detector (posts/videos and profiles)
+
+# Scraper instrumentation: JSON dump per process after every cycle (None disables it)
+METRICS_DUMP_DIR = os.path.join(DATA_DIR, 'metrics')
+# Prometheus text endpoint per process, e.g. {'orchestrator': 9100, 'instagram': 9101, 'tiktok': 9102, 'youtube': 9103}
+METRICS_PORTS = {}
+METRICS_SLOWEST = 5  # Slowest influencers logged per cycle
+
+# Platforms run by orchestrator.py in a single process
+ORCHESTRATOR_PLATFORMS = ['instagram', 'tiktok', 'youtube']
+
+# Incremental post/video fetch: recent posts tracked per account and the newest of them the
+# engagement metrics are computed from. Refreshes only page through posts newer than the newest
+# tracked one; every MEDIA_DEEP_REFRESH_EVERY-th refresh re-reads the whole tracked set
+MEDIA_TRACK_DEPTH = 50
+MEDIA_METRICS_WINDOW = {'instagram': 10, 'tiktok': 5, 'youtube': 10}
+MEDIA_DEEP_REFRESH_EVERY = 4
+MEDIA_CURSOR_FILE = os.path.join(DATA_DIR, 'media_cursors.sqlite3')
+MEDIA_CURSOR_TTL = 90 * 24 * 3600  # State of accounts not refreshed for this long is dropped (next fetch is a full one)
+MEDIA_CURSOR_MAX_ENTRIES = 1000000
+
+# Username -> platform user ID cache; entries are dropped when a request with them fails,
+# the TTL is only a safety net
+IDENTITY_CACHE_FILE = os.path.join(DATA_DIR, 'identities.sqlite3')
+IDENTITY_CACHE_TTL = 365 * 24 * 3600
+IDENTITY_CACHE_MAX_ENTRIES = 1000000
+
+# Bulk onboarding (onboard.py): influencers resolved and inserted per batch
+ONBOARDING_BATCH_SIZE = 500
+
+# Fetched payloads are spooled to <SPOOL_DIR>/<platform>.jsonl until they are written to the
+# database, so a crash or a dropped connection does not lose API fetches
+SPOOL_DIR = os.path.join(DATA_DIR, 'spool')
+SPOOL_FSYNC = True  # fsync every appended payload; False trades crash safety for fewer disk syncs
+
+# Rows the database rejects (out-of-range values, FK violations) are moved out of the write batch
+# to <QUARANTINE_DIR>/<platform>.jsonl instead of blocking every later flush
+QUARANTINE_DIR = os.path.join(DATA_DIR, 'quarantine')
 
 # Add additional configurations for other platforms here
\ No newline at end of file
@@ -1,7 +1,114 @@
 # common/db.py
+import queue
+import threading
+from contextlib import contextmanager
+
 import mysql.connector
-from common.config import DB_CONFIG
+from common.config import DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT
 
 def get_db_connection():
     """Establishes a connection to the database."""
     return mysql.connector.connect(**DB_CONFIG)
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections that are checked for liveness on checkout."""
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, connect=get_db_connection):
+        self.size = size
+        self.timeout = timeout
+        self.connect = connect
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _checkout(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self.connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f"No database connection available after {self.timeout}s") from None
+
+        # Idle connections may have been dropped by the server during long sleeps
+        try:
+            conn.ping(reconnect=True, attempts=3, delay=1)
+        except mysql.connector.Error:
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+            try:
+                conn = self.connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return conn
+
+    def _checkin(self, conn):
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error."""
+        conn = self._checkout()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass  # A broken connection is replaced on the next checkout
+            raise
+        finally:
+            self._checkin(conn)
+
+    @contextmanager
+    def cursor(self):
+        """Borrow a connection and yield a cursor on it, within one transaction."""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+            with self._lock:
+                self._created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Returns the process-wide connection pool shared by all scrapers."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
@@ -0,0 +1,59 @@
+# common/identity_cache.py
+import threading
+
+from common.cache import Cache
+from common.config import IDENTITY_CACHE_FILE, IDENTITY_CACHE_TTL, IDENTITY_CACHE_MAX_ENTRIES
+
+
+class IdentityCache:
+    """Persistent map of influencer usernames to the platform's user IDs.
+
+    IDs practically never change, so refreshes skip the username lookup.
+    An entry is only dropped when a request with it fails (deleted or
+    renamed account); the next refresh then resolves the username again.
+    Entries are kept in a SQLite file and survive restarts.
+    """
+
+    def __init__(self, platform, path=IDENTITY_CACHE_FILE):
+        self.platform = platform
+        self.store = Cache(path, ttl=IDENTITY_CACHE_TTL, max_entries=IDENTITY_CACHE_MAX_ENTRIES)
+        self.stats = {'hits': 0, 'lookups': 0, 'invalidated': 0}
+        self._lock = threading.Lock()
+
+    def _key(self, username):
+        return f"{self.platform}:{username.lower()}"
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, username):
+        return self.store.get(self._key(username))
+
+    def set(self, username, identity):
+        self.store.set(self._key(username), identity)
+
+    def invalidate(self, username):
+        self.store.delete(self._key(username))
+        self._count('invalidated')
+
+    def cached(self, username):
+        """Cached identity of `username` or None, counted as a hit; read it once per refresh."""
+        identity = self.get(username)
+        if identity is not None:
+            self._count('hits')
+        return identity
+
+    def lookup(self, username, lookup):
+        """Resolve `username` with lookup(username) and store the identity for the next time."""
+        self._count('lookups')
+        identity = lookup(username)
+        self.set(username, identity)
+        return identity
+
+    def report(self):
+        """Return the counters since the last report and reset them."""
+        with self._lock:
+            summary = ", ".join(f"{count} {stat}" for stat, count in self.stats.items())
+            self.stats = {'hits': 0, 'lookups': 0, 'invalidated': 0}
+        return summary
@@ -0,0 +1,155 @@
+# common/impact_score.py
+import sys
+import os
+import math
+import time
+
+# Allow running as a script: python common/impact_score.py --rebuild
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.config import (
+    IMPACT_WEIGHTS,
+    IMPACT_BOT_PENALTY,
+    IMPACT_CROSS_PLATFORM_BONUS,
+    IMPACT_RANK_INTERVAL,
+    IMPACT_LEADERBOARD_SIZE,
+)
+
+# Pseudo-platform of the combined cross-platform score
+ALL = 'all'
+
+# Values at which a component reaches its full weight: 100M followers,
+# 10 % engagement rate, 5 % follower growth per refresh
+REACH_FULL = 8.0  # log10 of the follower count
+ENGAGEMENT_FULL = 10.0
+GROWTH_FULL = 5.0
+
+UPSERT_SCORE = """
+    INSERT INTO impact_scores (influencer_id, platform, score, followers_count, engagement_rate, growth_rate, bot_flag)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        score = VALUES(score), followers_count = VALUES(followers_count), engagement_rate = VALUES(engagement_rate),
+        growth_rate = VALUES(growth_rate), bot_flag = VALUES(bot_flag), updated_at = CURRENT_TIMESTAMP
+"""
+
+# Combined score: best platform plus a share of the others
+COMBINED_SCORES = f"""
+    INSERT INTO impact_scores (influencer_id, platform, score, followers_count, bot_flag)
+    SELECT influencer_id, '{ALL}', MAX(score) + %s * (SUM(score) - MAX(score)), SUM(followers_count), MAX(bot_flag)
+    FROM impact_scores
+    WHERE platform <> '{ALL}' {{condition}}
+    GROUP BY influencer_id
+    ON DUPLICATE KEY UPDATE
+        score = VALUES(score), followers_count = VALUES(followers_count), bot_flag = VALUES(bot_flag),
+        updated_at = CURRENT_TIMESTAMP
+"""
+UPSERT_COMBINED = COMBINED_SCORES.format(condition='AND influencer_id = %s')
+
+# Ranks of all platforms (and the combined score) in one statement
+REFRESH_RANKINGS = """
+    UPDATE impact_scores s
+    JOIN (
+        SELECT influencer_id, platform,
+               ROW_NUMBER() OVER (PARTITION BY platform ORDER BY score DESC, influencer_id) AS position
+        FROM impact_scores
+    ) ranked ON ranked.influencer_id = s.influencer_id AND ranked.platform = s.platform
+    SET s.ranking = ranked.position
+"""
+
+
+def platform_score(followers_count, engagement_rate, growth_rate, bot_flag, weights=IMPACT_WEIGHTS):
+    """Impact score (0-100) of one account from reach, engagement and growth; flagged accounts are penalized."""
+    reach = min(math.log10(max(followers_count or 0, 0) + 1) / REACH_FULL, 1.0)
+    engagement = min(max(float(engagement_rate or 0), 0.0) / ENGAGEMENT_FULL, 1.0)
+    growth = min(max(float(growth_rate or 0), 0.0) / GROWTH_FULL, 1.0)
+    score = 100 * (weights['reach'] * reach + weights['engagement'] * engagement + weights['growth'] * growth)
+    return score * IMPACT_BOT_PENALTY if bot_flag else score
+
+
+def update_scores(cursor, platform, snapshot):
+    """Update the account's platform score and its influencer's combined score from a new snapshot.
+
+    Costs two statements per refresh instead of re-aggregating the history tables.
+    """
+    influencer_id = snapshot['influencer_id']
+    if influencer_id is None:
+        return None
+    score = platform_score(snapshot['followers_count'], snapshot['engagement_rate'],
+                           snapshot['growth_rate'], snapshot['bot_flag'])
+    cursor.execute(UPSERT_SCORE, (influencer_id, platform, score, snapshot['followers_count'],
+                                  snapshot['engagement_rate'], snapshot['growth_rate'], snapshot['bot_flag']))
+    cursor.execute(UPSERT_COMBINED, (IMPACT_CROSS_PLATFORM_BONUS, influencer_id))
+    return score
+
+
+def refresh_rankings(cursor):
+    started = time.perf_counter()
+    cursor.execute(REFRESH_RANKINGS)
+    print(f"Refreshed impact rankings in {time.perf_counter() - started:.2f}s")
+
+
+_last_refresh = 0.0
+
+def refresh_rankings_if_due(pool, interval=IMPACT_RANK_INTERVAL):
+    """Recompute the stored ranks at most every `interval` seconds. Call at the end of a cycle."""
+    global _last_refresh
+    if time.monotonic() - _last_refresh < interval:
+        return False
+    with pool.cursor() as cursor:
+        refresh_rankings(cursor)
+    _last_refresh = time.monotonic()
+    return True
+
+
+def get_leaderboard(cursor, platform=ALL, limit=IMPACT_LEADERBOARD_SIZE):
+    """Top influencers of a platform (or 'all') by precomputed rank; an index range scan."""
+    cursor.execute("""
+        SELECT s.ranking, s.influencer_id, s.score, s.followers_count, s.bot_flag,
+               i.Instagram_Username, i.TikTok_Username, i.YouTube_ChannelID
+        FROM impact_scores s
+        JOIN influencers i ON i.influencer_id = s.influencer_id
+        WHERE s.platform = %s AND s.ranking <= %s
+        ORDER BY s.ranking
+    """, (platform, limit))
+    return cursor.fetchall()
+
+
+def get_rank(cursor, influencer_id):
+    """{platform: (ranking, score)} of one influencer."""
+    cursor.execute("SELECT platform, ranking, score FROM impact_scores WHERE influencer_id = %s", (influencer_id,))
+    return {platform: (ranking, score) for platform, ranking, score in cursor.fetchall()}
+
+
+def rebuild(cursor):
+    """Recompute all scores from account_snapshots (e.g. after changing the weights)."""
+    cursor.execute("""
+        SELECT platform, influencer_id, followers_count, engagement_rate, growth_rate, bot_flag
+        FROM account_snapshots
+        WHERE influencer_id IS NOT NULL
+    """)
+    rows = cursor.fetchall()
+    params = [(influencer_id, platform, platform_score(followers, engagement_rate, growth_rate, bot_flag),
+               followers, engagement_rate, growth_rate, bot_flag)
+              for platform, influencer_id, followers, engagement_rate, growth_rate, bot_flag in rows]
+    for i in range(0, len(params), 1000):
+        cursor.executemany(UPSERT_SCORE, params[i:i + 1000])
+    cursor.execute(COMBINED_SCORES.format(condition=''), (IMPACT_CROSS_PLATFORM_BONUS,))
+    refresh_rankings(cursor)
+    print(f"Rebuilt impact scores of {len(params)} accounts")
+
+
+if __name__ == "__main__":
+    from common.db import get_pool
+
+    with get_pool().cursor() as cursor:
+        if '--rebuild' in sys.argv:
+            rebuild(cursor)
+        elif '--top' in sys.argv:
+            args = [arg for arg in sys.argv[1:] if arg != '--top']
+            platform = next((arg for arg in args if not arg.isdigit()), ALL)
+            limit = next((int(arg) for arg in args if arg.isdigit()), IMPACT_LEADERBOARD_SIZE)
+            for ranking, influencer_id, score, followers, bot_flag, *accounts in get_leaderboard(cursor, platform, limit):
+                names = ", ".join(account for account in accounts if account)
+                print(f"{ranking:>5}. {score:6.2f}  {names} ({followers} followers){' [bot]' if bot_flag else ''}")
+        else:
+            print("Usage: python common/impact_score.py --rebuild | --top [all|instagram|tiktok|youtube] [N]")
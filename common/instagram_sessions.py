@@ -0,0 +1,138 @@
+# common/instagram_sessions.py
+import os
+import threading
+import time
+
+from instagrapi import Client
+from instagrapi.exceptions import (
+    BadPassword,
+    ChallengeRequired,
+    FeedbackRequired,
+    LoginRequired,
+    PleaseWaitFewMinutes,
+)
+from common.config import (
+    INSTAGRAM_ACCOUNTS,
+    INSTAGRAM_SESSION_DIR,
+    INSTAGRAM_ACCOUNT_COOLDOWN,
+    INSTAGRAM_REQUESTS_PER_MINUTE,
+)
+from common.rate_limit import TokenBucket
+from common.instrumentation import get_instrumentation
+
+instrumentation = get_instrumentation()
+
+# Errors after which the stored session is no longer valid and a fresh login is needed
+AUTH_ERRORS = (LoginRequired,)
+
+# Errors after which the account should rest for a while and another one is used
+COOLDOWN_ERRORS = (ChallengeRequired, FeedbackRequired, PleaseWaitFewMinutes, BadPassword)
+
+
+class InstagramSession:
+    """One logged-in instagrapi client, its persisted settings file and its request budget."""
+
+    def __init__(self, username, password, session_dir, requests_per_minute=INSTAGRAM_REQUESTS_PER_MINUTE):
+        self.username = username
+        self.password = password
+        self.settings_file = os.path.join(session_dir, f"{username}.json")
+        self.client = None
+        self.cooldown_until = 0
+        self.bucket = TokenBucket(requests_per_minute)
+
+    def login(self, force=False):
+        """Log in, reusing the stored session settings unless force is set."""
+        cl = Client()
+        if not force and os.path.exists(self.settings_file):
+            cl.load_settings(self.settings_file)
+        with instrumentation.stage('instagram', 'login'):
+            cl.login(self.username, self.password)
+        os.makedirs(os.path.dirname(self.settings_file) or '.', exist_ok=True)
+        cl.dump_settings(self.settings_file)
+        self.client = cl
+        print(f"Logged in Instagram account {self.username}")
+        return cl
+
+    def ready_client(self):
+        return self.client or self.login()
+
+
+class InstagramSessionPool:
+    """Hands out logged-in clients from a pool of accounts in round-robin order.
+
+    A borrowed account is used by one thread at a time, so the number of
+    concurrent fetches is bounded by the number of accounts.
+    """
+
+    def __init__(self, accounts=INSTAGRAM_ACCOUNTS, session_dir=INSTAGRAM_SESSION_DIR,
+                 cooldown=INSTAGRAM_ACCOUNT_COOLDOWN):
+        if not accounts:
+            raise ValueError("At least one Instagram account is required")
+        self.sessions = [InstagramSession(username, password, session_dir) for username, password in accounts]
+        self.cooldown = cooldown
+        self._idle = list(self.sessions)
+        self._condition = threading.Condition()
+        self._local = threading.local()  # Session borrowed by the current thread inside run()
+
+    def acquire(self):
+        """Borrow the next idle account that is not cooling down (blocks until one is free)."""
+        with self._condition:
+            while True:
+                now = time.time()
+                for session in self._idle:
+                    if session.cooldown_until <= now:
+                        self._idle.remove(session)
+                        return session
+                if self._idle:
+                    # Every idle account is cooling down, wait for the first one to recover
+                    self._condition.wait(min(s.cooldown_until for s in self._idle) - now)
+                else:
+                    self._condition.wait()
+
+    def release(self, session):
+        with self._condition:
+            # Returned accounts go to the back so requests rotate across the pool
+            self._idle.append(session)
+            self._condition.notify()
+
+    def run(self, fn, *args, cost=1):
+        """Call fn(client, *args) with a borrowed client.
+
+        `cost` request tokens are taken from the account's budget first.
+        Requests beyond `cost` that fn only knows about once it runs are
+        taken with charge(). Re-authenticates once if the session expired;
+        accounts that get challenged or throttled are put on cooldown and the
+        call moves on to the next account.
+        """
+        attempts = len(self.sessions)
+        while True:
+            session = self.acquire()
+            self._local.session = session
+            try:
+                session.bucket.acquire(cost)
+                instrumentation.count('api_calls', 'instagram', cost)
+                try:
+                    return fn(session.ready_client(), *args)
+                except AUTH_ERRORS:
+                    print(f"Session for {session.username} expired, logging in again")
+                    instrumentation.count('retries', 'instagram')
+                    return fn(session.login(force=True), *args)
+            except COOLDOWN_ERRORS as e:
+                print(f"Instagram account {session.username} needs a break: {e}")
+                instrumentation.count('retries', 'instagram')
+                session.client = None
+                session.cooldown_until = time.time() + self.cooldown
+                attempts -= 1
+                if attempts <= 0:
+                    raise
+            finally:
+                self._local.session = None
+                self.release(session)
+
+    def charge(self, tokens=1):
+        """Take `tokens` more requests from the budget of the account the calling thread runs on."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            raise RuntimeError("charge() must be called from within InstagramSessionPool.run()")
+        session.bucket.acquire(tokens)
+        instrumentation.count('api_calls', 'instagram', tokens)
@@ -0,0 +1,191 @@
+# common/instrumentation.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.config import METRICS_DUMP_DIR, METRICS_PORTS, METRICS_SLOWEST
+
+# Upper bounds (seconds) of the stage and cycle duration histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram:
+    """Cumulative-bucket histogram as used by the Prometheus text format."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': round(self.sum, 6), 'max': round(self.max, 6),
+                'avg': round(self.sum / self.count, 6) if self.count else 0,
+                'buckets': {('+Inf' if bound == float('inf') else str(bound)): total
+                            for bound, total in self.cumulative()}}
+
+
+class Instrumentation:
+    """Per-stage timings, counters and slowest influencers of the scraper cycles.
+
+    Stages are timed per (platform, stage) into histograms and summed per
+    influencer for the running cycle; end_cycle() logs the slowest
+    influencers and writes the JSON dump. Counters cover API calls, errors
+    and retries. Safe to use from worker threads.
+    """
+
+    def __init__(self, name='scraper', dump_dir=METRICS_DUMP_DIR, slowest=METRICS_SLOWEST):
+        self.name = name
+        self.dump_dir = dump_dir
+        self.slowest = slowest
+        self.histograms = {}  # (metric, platform, stage) -> Histogram
+        self.counters = {}  # (metric, platform) -> int
+        self._cycle = {}  # platform -> {account: {stage: seconds}}
+        self._cycle_started = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def observe(self, metric, platform, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get((metric, platform, stage))
+            if histogram is None:
+                histogram = self.histograms[(metric, platform, stage)] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, metric, platform, amount=1):
+        with self._lock:
+            self.counters[(metric, platform)] = self.counters.get((metric, platform), 0) + amount
+
+    @contextmanager
+    def stage(self, platform, stage, account=None):
+        """Time one stage; with an account, the time also counts towards that influencer's cycle total."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe('stage_seconds', platform, stage, elapsed)
+            if account is not None:
+                with self._lock:
+                    stages = self._cycle.setdefault(platform, {}).setdefault(account, {})
+                    stages[stage] = stages.get(stage, 0.0) + elapsed
+
+    def start_cycle(self, platform):
+        with self._lock:
+            self._cycle[platform] = {}
+            self._cycle_started[platform] = time.perf_counter()
+
+    def end_cycle(self, platform):
+        """Record the cycle duration, log the slowest influencers and dump the metrics."""
+        with self._lock:
+            accounts = self._cycle.pop(platform, {})
+            started = self._cycle_started.pop(platform, None)
+        if started is not None:
+            self.observe('cycle_seconds', platform, 'cycle', time.perf_counter() - started)
+        slowest = sorted(accounts.items(), key=lambda item: sum(item[1].values()), reverse=True)[:self.slowest]
+        for account, stages in slowest:
+            breakdown = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stages.items())
+            print(f"Slow {platform} influencer {account}: {sum(stages.values()):.2f}s ({breakdown})")
+        self.dump()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'time': time.time(),
+                'counters': {f"{metric}{{platform={platform}}}": value
+                             for (metric, platform), value in sorted(self.counters.items())},
+                'histograms': {f"{metric}{{platform={platform},stage={stage}}}": histogram.to_dict()
+                               for (metric, platform, stage), histogram in sorted(self.histograms.items())},
+            }
+
+    def dump(self):
+        """Write the current metrics to <dump_dir>/<name>.json (replaced atomically)."""
+        if not self.dump_dir:
+            return
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(self.dump_dir, f"{self.name}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def render_prometheus(self):
+        """Render all counters and histograms in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for metric in sorted({metric for metric, _ in self.counters}):
+                lines.append(f"# TYPE influscore_{metric}_total counter")
+                for (name, platform), value in sorted(self.counters.items()):
+                    if name == metric:
+                        lines.append(f'influscore_{metric}_total{{platform="{platform}"}} {value}')
+            for metric in sorted({metric for metric, _, _ in self.histograms}):
+                lines.append(f"# TYPE influscore_{metric} histogram")
+                for (name, platform, stage), histogram in sorted(self.histograms.items()):
+                    if name != metric:
+                        continue
+                    labels = f'platform="{platform}",stage="{stage}"'
+                    for bound, total in histogram.cumulative():
+                        le = '+Inf' if bound == float('inf') else bound
+                        lines.append(f'influscore_{metric}_bucket{{{labels},le="{le}"}} {total}')
+                    lines.append(f'influscore_{metric}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'influscore_{metric}_count{{{labels}}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """Serve /metrics in the Prometheus text format from a background thread."""
+        instrumentation = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = instrumentation.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrape requests out of the scraper log
+
+        self._server = ThreadingHTTPServer(('', port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Serving metrics for {self.name} on port {port}")
+
+
+_instrumentation = Instrumentation()
+
+def get_instrumentation():
+    """Returns the process-wide instrumentation shared by all scrapers."""
+    return _instrumentation
+
+def start_exporter(name):
+    """Name the process's metrics dump and start its HTTP endpoint if a port is configured."""
+    _instrumentation.name = name
+    port = METRICS_PORTS.get(name)
+    if port and _instrumentation._server is None:
+        _instrumentation.serve(port)
+    return _instrumentation
@@ -0,0 +1,84 @@
+# common/media_cursors.py
+import threading
+
+from common.cache import Cache
+from common.config import (
+    MEDIA_TRACK_DEPTH,
+    MEDIA_METRICS_WINDOW,
+    MEDIA_DEEP_REFRESH_EVERY,
+    MEDIA_CURSOR_FILE,
+    MEDIA_CURSOR_TTL,
+    MEDIA_CURSOR_MAX_ENTRIES,
+)
+
+# Refresh plans, from cheapest to most expensive
+STATS = 'stats'  # Media count unchanged: only re-read the stats of the newest posts
+NEW = 'new'  # New posts: page through the listing until the newest tracked post
+FULL = 'full'  # No state yet, or deep refresh: page through the listing down to the tracked depth
+
+
+class MediaCursors:
+    """Tracked recent post/video IDs per account, for incremental media fetches.
+
+    Per account, the IDs of the tracked posts (newest first, at most
+    `depth`), the media count of the profile at the last fetch and the
+    refreshes since the last full one are kept in a SQLite file, so the
+    state survives restarts. An account without state gets a full fetch.
+    """
+
+    def __init__(self, platform, path=MEDIA_CURSOR_FILE, depth=MEDIA_TRACK_DEPTH,
+                 window=None, deep_every=MEDIA_DEEP_REFRESH_EVERY):
+        self.platform = platform
+        self.depth = depth
+        self.window = window or MEDIA_METRICS_WINDOW[platform]
+        self.deep_every = deep_every
+        self.store = Cache(path, ttl=MEDIA_CURSOR_TTL, max_entries=MEDIA_CURSOR_MAX_ENTRIES)
+        self.plans = {STATS: 0, NEW: 0, FULL: 0}
+        self._lock = threading.Lock()  # plan() runs on the Instagram worker threads
+
+    def get(self, account):
+        return self.store.get(f"{self.platform}:{account}") or {'tracked': [], 'media_count': None, 'refreshes': 0}
+
+    def plan(self, state, media_count):
+        """Pick the cheapest refresh that still sees every new post of the account."""
+        if not state['tracked'] or state['refreshes'] + 1 >= self.deep_every:
+            plan = FULL
+        elif media_count != state['media_count']:
+            plan = NEW
+        else:
+            plan = STATS
+        with self._lock:
+            self.plans[plan] += 1
+        return plan
+
+    def enough(self, plan, fetched, reached_known):
+        """True once `fetched` items (newest first) cover what `plan` needs."""
+        if fetched >= self.depth:
+            return True
+        if plan == FULL:
+            return False
+        return fetched >= self.window and (plan == STATS or reached_known)
+
+    def update(self, account, state, plan, media_count, ids):
+        """Merge the fetched IDs (newest first) into the tracked set; returns the new tracked IDs."""
+        if plan == FULL:
+            tracked = list(dict.fromkeys(ids))  # A full fetch also drops deleted posts
+        else:
+            tracked = list(dict.fromkeys(list(ids) + state['tracked']))
+        tracked = tracked[:self.depth]
+        refreshes = 0 if plan == FULL else state['refreshes'] + 1
+        self.store.set(f"{self.platform}:{account}",
+                       {'tracked': tracked, 'media_count': media_count, 'refreshes': refreshes})
+        return tracked
+
+    def report(self):
+        """Return the refresh plans since the last report and reset them."""
+        with self._lock:
+            summary = ", ".join(f"{count} {plan}" for plan, count in self.plans.items())
+            self.plans = {STATS: 0, NEW: 0, FULL: 0}
+        return summary
+
+
+def newest(items, key, window):
+    """The `window` newest items by their `key` timestamp (pinned posts may be listed first)."""
+    return sorted(items, key=lambda item: (item.get(key) is not None, item.get(key)), reverse=True)[:window]
@@ -0,0 +1,10 @@
+# common/metrics.py
+
+def calculate_metrics(posts, followers_count, like_key='like_count', comment_key='comment_count'):
+    """Calculate avg_likes, avg_comments, total_likes, total_comments and engagement_rate for a list of posts."""
+    total_likes = sum(post[like_key] for post in posts)
+    total_comments = sum(post[comment_key] for post in posts)
+    avg_likes = total_likes // len(posts) if posts else 0
+    avg_comments = total_comments // len(posts) if posts else 0
+    engagement_rate = (total_likes + total_comments) / followers_count * 100 if followers_count > 0 else 0
+    return avg_likes, avg_comments, total_likes, total_comments, engagement_rate
@@ -0,0 +1,50 @@
+# common/refresh_policy.py
+from datetime import datetime
+
+from common.config import (
+    BOT_MIN_POINTS,
+    REFRESH_BASE_INTERVAL,
+    REFRESH_MIN_INTERVAL,
+    REFRESH_MAX_INTERVAL,
+)
+
+# Activity that counts as "normal" for each signal: 1 % follower growth per refresh,
+# a 10 percentage point standard deviation of engagement growth, one post per day
+GROWTH_REFERENCE = 1.0
+ENGAGEMENT_STD_REFERENCE = 10.0
+POSTS_PER_DAY_REFERENCE = 1.0
+
+# Lowest activity taken into account, so quiet accounts are refreshed every base / QUIET_ACTIVITY
+QUIET_ACTIVITY = 1.0 / 3
+
+
+def posts_per_day(timestamps, now=None):
+    """Posting frequency from the timestamps of the fetched recent posts."""
+    # instagrapi returns aware datetimes, the other clients naive local ones
+    timestamps = [t.astimezone().replace(tzinfo=None) if t.tzinfo else t for t in timestamps if t is not None]
+    if not timestamps:
+        return 0.0
+    days = ((now or datetime.now()) - min(timestamps)).total_seconds() / 86400
+    return len(timestamps) / max(days, 1.0)
+
+
+def refresh_interval(snapshot, base=REFRESH_BASE_INTERVAL,
+                     min_interval=REFRESH_MIN_INTERVAL, max_interval=REFRESH_MAX_INTERVAL):
+    """Seconds until the next refresh of an account, from its latest snapshot.
+
+    Flagged accounts are watched at the minimum interval. Otherwise the
+    strongest of growth rate, engagement volatility and posting frequency
+    (relative to its reference) shortens the interval; quiet accounts drift
+    towards max_interval. Accounts without enough history keep `base`.
+    """
+    if snapshot['bot_flag']:
+        return min_interval
+    if snapshot['samples'] < BOT_MIN_POINTS:
+        return base
+    activity = max(
+        abs(float(snapshot['growth_rate'] or 0)) / GROWTH_REFERENCE,
+        max(float(snapshot['engagement_var']), 0.0) ** 0.5 / ENGAGEMENT_STD_REFERENCE,
+        float(snapshot['posts_per_day'] or 0) / POSTS_PER_DAY_REFERENCE,
+    )
+    # Activity 1.0 keeps the base interval, 2.0 halves it
+    return int(min(max(base / max(activity, QUIET_ACTIVITY), min_interval), max_interval))
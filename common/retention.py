@@ -0,0 +1,145 @@
+# common/retention.py
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Allow running as a script: python common/retention.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.db import get_pool
+from common.config import (
+    HISTORY_RETENTION_DAYS,
+    HISTORY_ROLLUP_PERIOD,
+    RETENTION_CHUNK_SIZE,
+    RETENTION_CHUNK_PAUSE,
+)
+
+# History table -> (entity column, time column, counter columns, rollup table)
+RETENTION_TABLES = {
+    'instagram_post_data_history': ('post_id', 'timestamp', ('likes_count', 'comments_count'), 'instagram_post_data_rollup'),
+    'tiktok_video_history': ('video_id', 'timestamp', ('view_count', 'like_count', 'comment_count'), 'tiktok_video_rollup'),
+    'youtube_video_history': ('video_id', 'last_updated', ('view_count', 'like_count', 'comment_count'), 'youtube_video_rollup'),
+}
+
+# Composite (entity, time) indexes used by the history lookups: table -> [(index name, columns)]
+HISTORY_INDEXES = {
+    'instagram_influencer_data_history': [('influencer_timestamp', ('influencer_id', 'timestamp'))],
+    'instagram_post_data_history': [('post_timestamp', ('post_id', 'timestamp')),
+                                    ('influencer_timestamp', ('influencer_id', 'timestamp'))],
+    'tiktok_profile_history': [('user_last_updated', ('user_id', 'last_updated'))],
+    'tiktok_video_history': [('video_timestamp', ('video_id', 'timestamp'))],
+    'youtube_channel_history': [('channel_last_updated', ('channel_id', 'last_updated'))],
+    'youtube_video_history': [('video_last_updated', ('video_id', 'last_updated'))],
+}
+
+
+def period_start(timestamp, period=HISTORY_ROLLUP_PERIOD):
+    day = timestamp.date()
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def ensure_indexes(cursor):
+    """Add missing composite history indexes (online DDL, no table lock)."""
+    for table, indexes in HISTORY_INDEXES.items():
+        cursor.execute("""
+            SELECT DISTINCT index_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s
+        """, (table,))
+        existing = {row[0] for row in cursor.fetchall()}
+        for name, columns in indexes:
+            if name not in existing:
+                print(f"Adding index {name} on {table}")
+                cursor.execute(f"ALTER TABLE {table} ADD INDEX {name} ({', '.join(columns)}), "
+                               f"ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def rollup_statement(rollup_table, entity_column, counters):
+    columns = [entity_column, 'period', 'period_start', 'samples', 'last_at']
+    updates = ['samples = samples + VALUES(samples)']
+    for counter in counters:
+        columns += [f'min_{counter}', f'max_{counter}', f'last_{counter}']
+        updates += [f'min_{counter} = LEAST(min_{counter}, VALUES(min_{counter}))',
+                    f'max_{counter} = GREATEST(max_{counter}, VALUES(max_{counter}))',
+                    f'last_{counter} = IF(VALUES(last_at) >= last_at, VALUES(last_{counter}), last_{counter})']
+    # last_at must be assigned after the last_* columns that compare against it
+    updates.append('last_at = GREATEST(last_at, VALUES(last_at))')
+    return f"""
+        INSERT INTO {rollup_table} ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))})
+        ON DUPLICATE KEY UPDATE {', '.join(updates)}
+    """
+
+
+def aggregate(rows, counters, period):
+    """Roll (id, entity, timestamp, *counters) rows up into min/max/last per entity and period."""
+    buckets = {}
+    for row in rows:
+        entity, timestamp, values = row[1], row[2], row[3:]
+        key = (entity, period_start(timestamp, period))
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = {'samples': 1, 'last_at': timestamp,
+                            'min': list(values), 'max': list(values), 'last': list(values)}
+            continue
+        bucket['samples'] += 1
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            bucket['min'][i] = value if bucket['min'][i] is None else min(bucket['min'][i], value)
+            bucket['max'][i] = value if bucket['max'][i] is None else max(bucket['max'][i], value)
+        if timestamp >= bucket['last_at']:
+            bucket['last_at'] = timestamp
+            bucket['last'] = list(values)
+
+    params = []
+    for (entity, start), bucket in buckets.items():
+        row = [entity, period, start, bucket['samples'], bucket['last_at']]
+        for i in range(len(counters)):
+            row += [bucket['min'][i], bucket['max'][i], bucket['last'][i]]
+        params.append(tuple(row))
+    return params
+
+
+def compact_table(pool, table, cutoff, period=HISTORY_ROLLUP_PERIOD,
+                  chunk_size=RETENTION_CHUNK_SIZE, pause=RETENTION_CHUNK_PAUSE):
+    """Move history rows older than cutoff into the rollup table, one short transaction per chunk."""
+    entity_column, time_column, counters, rollup_table = RETENTION_TABLES[table]
+    upsert = rollup_statement(rollup_table, entity_column, counters)
+    compacted = 0
+    while True:
+        with pool.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT id, {entity_column}, {time_column}, {', '.join(counters)} FROM {table}
+                WHERE {time_column} < %s
+                ORDER BY id
+                LIMIT %s
+            """, (cutoff, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(upsert, aggregate(rows, counters, period))
+            ids = [row[0] for row in rows]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+        compacted += len(rows)
+        if len(rows) < chunk_size:
+            break
+        time.sleep(pause)  # Let the scrapers' writes through between chunks
+    print(f"Compacted {compacted} rows of {table} older than {cutoff:%Y-%m-%d} into {rollup_table}")
+    return compacted
+
+
+def run_retention(retention_days=HISTORY_RETENTION_DAYS, period=HISTORY_ROLLUP_PERIOD):
+    pool = get_pool()
+    with pool.cursor() as cursor:
+        ensure_indexes(cursor)
+    # Only roll up whole periods so a bucket is never split between raw rows and its rollup
+    cutoff = datetime.combine(period_start(datetime.now() - timedelta(days=retention_days), period), datetime.min.time())
+    for table in RETENTION_TABLES:
+        compact_table(pool, table, cutoff, period)
+
+
+if __name__ == "__main__":
+    run_retention()
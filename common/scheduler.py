@@ -0,0 +1,161 @@
+# common/scheduler.py
+import heapq
+import time
+from datetime import datetime, timedelta
+
+from common.config import REFRESH_BASE_INTERVAL, REFRESH_BUDGETS
+
+# Refresh interval of accounts without an adaptive interval yet (see common/refresh_policy.py)
+REFRESH_INTERVAL = timedelta(seconds=REFRESH_BASE_INTERVAL)
+
+# Retry delay after a failed fetch (the old polling loops retried every 10 minutes)
+RETRY_INTERVAL = timedelta(minutes=10)
+
+# How often the influencer list is re-read so newly added accounts get scheduled
+RELOAD_INTERVAL = timedelta(hours=1)
+
+# One set-based query per platform: every tracked account together with the
+# time of its latest snapshot and its adaptive refresh interval (NULL if it was never fetched).
+DUE_QUERY = """
+    SELECT i.influencer_id, i.{account_column}, MAX(s.last_updated), MAX(s.refresh_interval)
+    FROM influencers i
+    LEFT JOIN account_snapshots s ON s.influencer_id = i.influencer_id AND s.platform = %s
+    WHERE i.{account_column} IS NOT NULL
+    GROUP BY i.influencer_id, i.{account_column}
+"""
+
+ACCOUNT_COLUMNS = {
+    'instagram': 'Instagram_Username',
+    'tiktok': 'TikTok_Username',
+    'youtube': 'YouTube_ChannelID',
+}
+
+
+class DueScheduler:
+    """Priority queue of accounts keyed on their next-due refresh time."""
+
+    def __init__(self, platforms, interval=REFRESH_INTERVAL, retry_interval=RETRY_INTERVAL,
+                 reload_interval=RELOAD_INTERVAL, budgets=REFRESH_BUDGETS):
+        self.platforms = list(platforms)
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.reload_interval = reload_interval
+        self.budgets = budgets
+        self._heap = []
+        self._due = {}  # (platform, influencer_id) -> (due_at, account)
+        self._rates = {}  # (platform, influencer_id) -> planned refreshes per day
+        self._rate_totals = {platform: 0.0 for platform in self.platforms}
+        self._loaded = set()  # (platform, influencer_id) of every account in the last load
+        self._counter = 0
+        self._last_reload = None
+
+    def __len__(self):
+        return len(self._due)
+
+    def load(self, cursor):
+        """Load next-due times for all configured platforms with one query each."""
+        for platform in self.platforms:
+            cursor.execute(DUE_QUERY.format(account_column=ACCOUNT_COLUMNS[platform]), (platform,))
+            seen = set()
+            for influencer_id, account, last_update, interval in cursor.fetchall():
+                key = (platform, influencer_id)
+                seen.add(key)
+                self._set_interval(key, interval)
+                due_at = last_update + self._scaled_interval(key) if last_update else datetime.now()
+                current = self._due.get(key)
+                # Keep an already scheduled entry unless the account changed
+                if current and current[1] == account:
+                    continue
+                self.schedule(platform, influencer_id, account, due_at)
+            # Forget accounts that were removed from the influencers table, including those being fetched
+            self._loaded = {k for k in self._loaded if k[0] != platform} | seen
+            for key in [k for k in self._due if k[0] == platform and k not in seen]:
+                del self._due[key]
+            for key in [k for k in self._rates if k[0] == platform and k not in seen]:
+                self._rate_totals[platform] -= self._rates.pop(key)
+        self._last_reload = datetime.now()
+
+    def tracked(self, platform):
+        """Number of loaded accounts of a platform, including those that are being fetched."""
+        return sum(1 for key in self._rates if key[0] == platform)
+
+    def needs_reload(self):
+        return self._last_reload is None or datetime.now() - self._last_reload >= self.reload_interval
+
+    def schedule(self, platform, influencer_id, account, due_at):
+        """(Re)schedule an account. Older heap entries for it become stale."""
+        self._due[(platform, influencer_id)] = (due_at, account)
+        self._counter += 1
+        heapq.heappush(self._heap, (due_at, self._counter, platform, influencer_id, account))
+
+    def reschedule(self, platform, influencer_id, account, success=True, interval=None):
+        """Schedule the next refresh after a fetch attempt.
+
+        `interval` is the account's adaptive refresh interval in seconds
+        (the snapshot's refresh_interval); without it the last known one is kept.
+        """
+        key = (platform, influencer_id)
+        if key not in self._loaded:
+            # Removed by a reload while it was being fetched: neither schedule it nor count its rate
+            self._rate_totals[platform] -= self._rates.pop(key, 0.0)
+            return
+        if interval is not None:
+            self._set_interval(key, interval)
+        delay = self._scaled_interval(key) if success else self.retry_interval
+        self.schedule(platform, influencer_id, account, datetime.now() + delay)
+
+    def _set_interval(self, key, interval):
+        seconds = interval or self.interval.total_seconds()
+        rate = 86400.0 / seconds
+        self._rate_totals[key[0]] += rate - self._rates.get(key, 0.0)
+        self._rates[key] = rate
+
+    def budget_factor(self, platform):
+        """How much all intervals of a platform are stretched to stay within its daily refresh budget."""
+        budget = self.budgets.get(platform)
+        if not budget:
+            return 1.0
+        return max(1.0, self._rate_totals[platform] / budget)
+
+    def _scaled_interval(self, key):
+        rate = self._rates.get(key)
+        interval = timedelta(days=1.0 / rate) if rate else self.interval
+        return interval * self.budget_factor(key[0])
+
+    def planned_refreshes(self, platform):
+        """Refreshes per day the current schedule will make, after applying the budget."""
+        return self._rate_totals[platform] / self.budget_factor(platform)
+
+    def _discard_stale(self):
+        while self._heap:
+            due_at, _, platform, influencer_id, account = self._heap[0]
+            if self._due.get((platform, influencer_id)) == (due_at, account):
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self):
+        """Return the earliest due time, or None if nothing is scheduled."""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Pop all accounts that are due as (platform, influencer_id, account) tuples."""
+        now = now or datetime.now()
+        due = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            _, _, platform, influencer_id, account = heapq.heappop(self._heap)
+            del self._due[(platform, influencer_id)]
+            due.append((platform, influencer_id, account))
+        return due
+
+    def seconds_until_next(self):
+        """Seconds until the next account is due or the influencer list must be reloaded."""
+        wake_at = self._last_reload + self.reload_interval if self._last_reload else datetime.now()
+        next_due = self.next_due()
+        if next_due is not None:
+            wake_at = min(wake_at, next_due)
+        return max(0.0, (wake_at - datetime.now()).total_seconds())
+
+    def wait(self):
+        """Sleep exactly until the next account is due."""
+        time.sleep(self.seconds_until_next())
@@ -0,0 +1,178 @@
+# common/snapshots.py
+import sys
+import os
+from datetime import datetime
+
+# Allow running as a script: python common/snapshots.py --rebuild
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.config import BOT_WINDOW
+from common.refresh_policy import refresh_interval
+from common.impact_score import update_scores
+
+# Smoothing factor of the exponentially weighted aggregates (span of BOT_WINDOW snapshots)
+ALPHA = 2.0 / (BOT_WINDOW + 1)
+
+SNAPSHOT_COLUMNS = (
+    'influencer_id', 'followers_count', 'total_likes', 'total_comments', 'engagement_rate', 'growth_rate',
+    'bot_flag', 'samples', 'growth_mean', 'growth_var', 'engagement_mean', 'engagement_var', 'posts_per_day',
+    'refresh_interval', 'last_updated',
+)
+
+UPSERT_SNAPSHOT = f"""
+    INSERT INTO account_snapshots (platform, account_id, {', '.join(SNAPSHOT_COLUMNS)})
+    VALUES (%s, %s, {', '.join(['%s'] * len(SNAPSHOT_COLUMNS))})
+    ON DUPLICATE KEY UPDATE
+        {', '.join(f'{column} = VALUES({column})' for column in SNAPSHOT_COLUMNS)}
+"""
+
+# Profile history per platform, used to rebuild the snapshot table
+REBUILD_QUERIES = {
+    'instagram': """
+        SELECT h.influencer_id, h.influencer_id, h.followers_count, h.total_likes, h.total_comments,
+               h.engagement_rate, h.growth_rate, h.bot_flag, h.timestamp
+        FROM instagram_influencer_data_history h
+        ORDER BY h.influencer_id, h.timestamp, h.id
+    """,
+    'tiktok': """
+        SELECT h.user_id, s.influencer_id, h.follower_count, h.total_likes, h.total_comments,
+               h.engagement_rate, h.growth_rate, h.bot_flag, h.last_updated
+        FROM tiktok_profile_history h
+        LEFT JOIN account_snapshots s ON s.platform = 'tiktok' AND s.account_id = h.user_id
+        ORDER BY h.user_id, h.last_updated, h.id
+    """,
+    'youtube': """
+        SELECT h.channel_id, i.influencer_id, h.subscriber_count, h.total_likes, h.total_comments,
+               h.engagement_rate, h.growth_rate, h.bot_flag, h.last_updated
+        FROM youtube_channel_history h
+        LEFT JOIN influencers i ON i.YouTube_ChannelID = h.channel_id
+        ORDER BY h.channel_id, h.last_updated, h.id
+    """,
+}
+
+
+def percent_change(previous, current):
+    """Percent change, or None if there is no positive previous value."""
+    if previous is None or current is None or previous <= 0:
+        return None
+    return (current - previous) / previous * 100
+
+
+def get_snapshot(cursor, platform, account_id):
+    """Latest state of one account as a dict, or None if it was never recorded."""
+    cursor.execute(f"""
+        SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM account_snapshots
+        WHERE platform = %s AND account_id = %s
+    """, (platform, str(account_id)))
+    row = cursor.fetchone()
+    return dict(zip(SNAPSHOT_COLUMNS, row)) if row else None
+
+
+def compute_growth_rate(previous, followers_count):
+    """Follower growth in percent since the previous snapshot (0 without a usable baseline)."""
+    change = percent_change(previous['followers_count'] if previous else None, followers_count)
+    return change if change is not None else 0
+
+
+def _ewm(mean, var, value):
+    """Update an exponentially weighted mean and variance with one observation."""
+    diff = value - mean
+    increment = ALPHA * diff
+    return mean + increment, (1 - ALPHA) * (var + diff * increment)
+
+
+def next_snapshot(previous, influencer_id, followers_count, total_likes, total_comments,
+                  engagement_rate, growth_rate, bot_flag, timestamp=None, posts_per_day=None):
+    """Fold a new snapshot into the previous state and return the new state."""
+    snapshot = {
+        'influencer_id': influencer_id,
+        'followers_count': followers_count,
+        'total_likes': total_likes,
+        'total_comments': total_comments,
+        'engagement_rate': engagement_rate,
+        'growth_rate': growth_rate,
+        'bot_flag': bool(bot_flag),
+        'samples': 0,
+        'growth_mean': 0.0,
+        'growth_var': 0.0,
+        'engagement_mean': 0.0,
+        'engagement_var': 0.0,
+        'posts_per_day': posts_per_day,
+        'refresh_interval': None,
+        'last_updated': timestamp or datetime.now(),
+    }
+    if previous:
+        if influencer_id is None:
+            snapshot['influencer_id'] = previous['influencer_id']
+        if posts_per_day is None:
+            snapshot['posts_per_day'] = previous.get('posts_per_day')
+        for key in ('samples', 'growth_mean', 'growth_var', 'engagement_mean', 'engagement_var'):
+            snapshot[key] = previous[key]
+        growth = percent_change(previous['followers_count'], followers_count)
+        engagement = percent_change((previous['total_likes'] or 0) + (previous['total_comments'] or 0),
+                                    (total_likes or 0) + (total_comments or 0))
+        if growth is not None:
+            snapshot['growth_mean'], snapshot['growth_var'] = _ewm(
+                float(snapshot['growth_mean']), float(snapshot['growth_var']), growth)
+            snapshot['samples'] += 1
+        if engagement is not None:
+            snapshot['engagement_mean'], snapshot['engagement_var'] = _ewm(
+                float(snapshot['engagement_mean']), float(snapshot['engagement_var']), engagement)
+    snapshot['refresh_interval'] = refresh_interval(snapshot)
+    return snapshot
+
+
+def record_snapshot(cursor, platform, account_id, previous, influencer_id, followers_count, total_likes,
+                    total_comments, engagement_rate, growth_rate, bot_flag, posts_per_day=None):
+    """Upsert the latest state of an account and its impact score. Call with the cursor that inserts the history row.
+
+    Returns the new state; its refresh_interval is the adaptive delay until the next refresh.
+    """
+    snapshot = next_snapshot(previous, influencer_id, followers_count, total_likes, total_comments,
+                             engagement_rate, growth_rate, bot_flag, posts_per_day=posts_per_day)
+    cursor.execute(UPSERT_SNAPSHOT, (platform, str(account_id), *(snapshot[c] for c in SNAPSHOT_COLUMNS)))
+    update_scores(cursor, platform, snapshot)
+    return snapshot
+
+
+def tiktok_influencer_ids(cursor):
+    """{user_id: influencer_id} of the TikTok usernames whose user ID is in the identity cache."""
+    from common.identity_cache import IdentityCache
+
+    identities = IdentityCache('tiktok')
+    cursor.execute("SELECT influencer_id, TikTok_Username FROM influencers WHERE TikTok_Username IS NOT NULL")
+    influencer_ids = {}
+    for influencer_id, username in cursor.fetchall():
+        identity = identities.get(username)
+        if identity:
+            influencer_ids[str(identity['user_id'])] = influencer_id
+    return influencer_ids
+
+
+def rebuild(cursor, platform):
+    """Recompute the snapshot table of one platform from its full history."""
+    # TikTok history only stores the user_id: accounts without a snapshot yet are matched via the identity cache
+    influencer_ids = tiktok_influencer_ids(cursor) if platform == 'tiktok' else {}
+    cursor.execute(REBUILD_QUERIES[platform])
+    rows = cursor.fetchall()
+    latest = {}
+    for account_id, influencer_id, followers, likes, comments, engagement_rate, growth, bot_flag, timestamp in rows:
+        influencer_id = influencer_id or influencer_ids.get(str(account_id))
+        latest[account_id] = next_snapshot(latest.get(account_id), influencer_id, followers, likes, comments,
+                                           engagement_rate, growth, bot_flag, timestamp)
+    params = [(platform, str(account_id), *(snapshot[c] for c in SNAPSHOT_COLUMNS))
+              for account_id, snapshot in latest.items()]
+    for i in range(0, len(params), 1000):
+        cursor.executemany(UPSERT_SNAPSHOT, params[i:i + 1000])
+    print(f"Rebuilt {len(params)} {platform} snapshots from {len(rows)} history rows")
+
+
+if __name__ == "__main__":
+    if '--rebuild' in sys.argv:
+        from common.db import get_pool
+
+        with get_pool().cursor() as cursor:
+            for platform in [arg for arg in sys.argv[1:] if arg in REBUILD_QUERIES] or REBUILD_QUERIES:
+                rebuild(cursor, platform)
+    else:
+        print("Usage: python common/snapshots.py --rebuild [instagram|tiktok|youtube ...]")
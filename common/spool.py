@@ -0,0 +1,155 @@
+# common/spool.py
+import os
+import threading
+from collections import OrderedDict
+
+from common.cache import dumps, loads
+from common.config import SPOOL_DIR, SPOOL_FSYNC
+from common.instrumentation import get_instrumentation
+from common.change_detection import commit_changes, discard_changes
+
+
+class Spool:
+    """Append-only file of fetched payloads that are not yet in the database.
+
+    Every payload is appended (and fsynced) before it is written, so a
+    crash or a dropped connection loses no API fetches: replay() writes the
+    leftover payloads on the next start instead of fetching them again. An
+    entry is acknowledged once its transaction is committed and the writer
+    has flushed its buffered rows (connect ack_saved to BatchWriter.on_flush).
+    A crash between a commit and its acknowledgement replays that payload
+    once more, which at most adds a duplicate history row.
+    """
+
+    def __init__(self, name, directory=SPOOL_DIR, fsync=SPOOL_FSYNC):
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self.fsync = fsync
+        self._pending = OrderedDict()  # id -> (influencer_id, account, payload)
+        self._saved = set()  # Committed, but rows may still be buffered in the writer
+        self._next_id = 1
+        self._file = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = loads(line)
+                    except ValueError:
+                        # A crash while appending leaves a partial last line
+                        print(f"Ignoring truncated record at the end of {self.path}")
+                        break
+                    if record['op'] == 'put':
+                        self._pending[record['id']] = (record['influencer_id'], record['account'], record['payload'])
+                        self._next_id = max(self._next_id, record['id'] + 1)
+                    else:
+                        for entry_id in record['ids']:
+                            self._pending.pop(entry_id, None)
+        self._rewrite()
+        if self._pending:
+            print(f"{len(self._pending)} unsaved payloads in {self.path}")
+
+    def _rewrite(self):
+        """Replace the file with the pending entries only (keeps it from growing forever)."""
+        if self._file:
+            self._file.close()
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            for entry_id, (influencer_id, account, payload) in self._pending.items():
+                f.write(dumps({'op': 'put', 'id': entry_id, 'influencer_id': influencer_id,
+                               'account': account, 'payload': payload}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.path + '.tmp', self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _write(self, record):
+        self._file.write(dumps(record) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, influencer_id, account, payload):
+        """Persist a fetched payload; returns its entry id."""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._write({'op': 'put', 'id': entry_id, 'influencer_id': influencer_id,
+                         'account': account, 'payload': payload})
+            self._pending[entry_id] = (influencer_id, account, payload)
+            return entry_id
+
+    def saved(self, entry_id):
+        """Mark an entry whose transaction has been committed."""
+        with self._lock:
+            self._saved.add(entry_id)
+
+    def ack_saved(self):
+        """Drop all committed entries; call after the writer has flushed."""
+        with self._lock:
+            if not self._saved:
+                return
+            for entry_id in self._saved:
+                self._pending.pop(entry_id, None)
+            if self._pending:
+                self._write({'op': 'ack', 'ids': sorted(self._saved)})
+            else:
+                self._rewrite()  # Truncate
+            self._saved.clear()
+
+    def pending(self):
+        """Entries that have not been written yet, oldest first."""
+        with self._lock:
+            return [(entry_id, *entry) for entry_id, entry in self._pending.items() if entry_id not in self._saved]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _save(self, pool, writer, save, entry_id, influencer_id, account, payload):
+        try:
+            with pool.cursor() as cursor:
+                result = save(cursor, writer, influencer_id, account, payload)
+        except Exception as e:
+            discard_changes()  # The history rows were rolled back, so they still count as changed
+            print(f"Could not save {self.name} account {account}, kept in {self.path}: {e}")
+            get_instrumentation().count('errors', self.name)
+            return False, None
+        commit_changes()
+        self.saved(entry_id)
+        try:
+            writer.flush_if_due()
+        except Exception as e:
+            # The rows stay buffered and the entries unacknowledged until a flush succeeds
+            print(f"Flush failed, retrying with the next flush: {e}")
+            get_instrumentation().count('errors', self.name)
+        return True, result
+
+    def save(self, pool, writer, save, influencer_id, account, payload):
+        """Spool a fetched payload, then write it with save(cursor, writer, influencer_id, account, payload)
+        in its own transaction. Returns save()'s result, or None if the write failed and the payload
+        stays spooled for replay.
+        """
+        entry_id = self.append(influencer_id, account, payload)
+        return self._save(pool, writer, save, entry_id, influencer_id, account, payload)[1]
+
+    def replay(self, pool, writer, save):
+        """Write the payloads left over from a previous run or from failed writes, without refetching.
+
+        Stops at the first failure (the database is most likely still
+        unreachable); returns the number of payloads written.
+        """
+        entries = self.pending()
+        if not entries:
+            return 0
+        print(f"Replaying {len(entries)} spooled {self.name} payloads from {self.path}")
+        replayed = 0
+        for entry in entries:
+            ok, _ = self._save(pool, writer, save, *entry)
+            if not ok:
+                break
+            replayed += 1
+        return replayed
@@ -1,6 +1,53 @@
 SET NAMES utf8mb4;
 SET FOREIGN_KEY_CHECKS = 0;
 
+-- ----------------------------
+-- Table structure for account_snapshots
+-- ----------------------------
+DROP TABLE IF EXISTS `account_snapshots`;
+CREATE TABLE `account_snapshots`  (
+  `platform` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `account_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `influencer_id` int NULL DEFAULT NULL,
+  `followers_count` bigint NULL DEFAULT NULL,
+  `total_likes` bigint NULL DEFAULT NULL,
+  `total_comments` bigint NULL DEFAULT NULL,
+  `engagement_rate` decimal(10, 2) NULL DEFAULT NULL,
+  `growth_rate` decimal(10, 2) NULL DEFAULT NULL,
+  `bot_flag` tinyint(1) NULL DEFAULT 0,
+  `samples` int NOT NULL DEFAULT 0,
+  `growth_mean` double NOT NULL DEFAULT 0,
+  `growth_var` double NOT NULL DEFAULT 0,
+  `engagement_mean` double NOT NULL DEFAULT 0,
+  `engagement_var` double NOT NULL DEFAULT 0,
+  `posts_per_day` double NULL DEFAULT NULL,
+  `refresh_interval` int NULL DEFAULT NULL,
+  `last_updated` datetime NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`platform`, `account_id`) USING BTREE,
+  INDEX `influencer_platform`(`influencer_id` ASC, `platform` ASC) USING BTREE,
+  CONSTRAINT `account_snapshots_ibfk_1` FOREIGN KEY (`influencer_id`) REFERENCES `influencers` (`influencer_id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for impact_scores
+-- ----------------------------
+DROP TABLE IF EXISTS `impact_scores`;
+CREATE TABLE `impact_scores`  (
+  `influencer_id` int NOT NULL,
+  `platform` varchar(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `score` double NOT NULL DEFAULT 0,
+  `followers_count` bigint NULL DEFAULT NULL,
+  `engagement_rate` decimal(10, 2) NULL DEFAULT NULL,
+  `growth_rate` decimal(10, 2) NULL DEFAULT NULL,
+  `bot_flag` tinyint(1) NULL DEFAULT 0,
+  `ranking` int NULL DEFAULT NULL,
+  `updated_at` datetime NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`influencer_id`, `platform`) USING BTREE,
+  INDEX `platform_ranking`(`platform` ASC, `ranking` ASC) USING BTREE,
+  INDEX `platform_score`(`platform` ASC, `score` DESC) USING BTREE,
+  CONSTRAINT `impact_scores_ibfk_1` FOREIGN KEY (`influencer_id`) REFERENCES `influencers` (`influencer_id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for influencers
 -- ----------------------------
@@ -44,6 +91,7 @@ CREATE TABLE `instagram_influencer_data_history`  (
   `bot_flag` tinyint(1) NULL DEFAULT 0,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `influencer_id`(`influencer_id` ASC) USING BTREE,
+  INDEX `influencer_timestamp`(`influencer_id` ASC, `timestamp` ASC) USING BTREE,
   CONSTRAINT `influencer_id` FOREIGN KEY (`influencer_id`) REFERENCES `influencers` (`influencer_id`) ON DELETE CASCADE ON UPDATE RESTRICT
 ) ENGINE = InnoDB AUTO_INCREMENT = 6 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
@@ -78,10 +126,31 @@ CREATE TABLE `instagram_post_data_history`  (
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `post_id`(`post_id` ASC) USING BTREE,
   INDEX `instagram_post_data_history_ibfk_2`(`influencer_id` ASC) USING BTREE,
+  INDEX `post_timestamp`(`post_id` ASC, `timestamp` ASC) USING BTREE,
+  INDEX `influencer_timestamp`(`influencer_id` ASC, `timestamp` ASC) USING BTREE,
   CONSTRAINT `instagram_post_data_history_ibfk_1` FOREIGN KEY (`post_id`) REFERENCES `instagram_post_data` (`post_id`) ON DELETE CASCADE ON UPDATE RESTRICT,
   CONSTRAINT `instagram_post_data_history_ibfk_2` FOREIGN KEY (`influencer_id`) REFERENCES `influencers` (`influencer_id`) ON DELETE CASCADE ON UPDATE RESTRICT
 ) ENGINE = InnoDB AUTO_INCREMENT = 41 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for instagram_post_data_rollup
+-- ----------------------------
+DROP TABLE IF EXISTS `instagram_post_data_rollup`;
+CREATE TABLE `instagram_post_data_rollup`  (
+  `post_id` bigint NOT NULL,
+  `period` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `period_start` date NOT NULL,
+  `samples` int NOT NULL DEFAULT 0,
+  `last_at` datetime NULL DEFAULT NULL,
+  `min_likes_count` int NULL DEFAULT NULL,
+  `max_likes_count` int NULL DEFAULT NULL,
+  `last_likes_count` int NULL DEFAULT NULL,
+  `min_comments_count` int NULL DEFAULT NULL,
+  `max_comments_count` int NULL DEFAULT NULL,
+  `last_comments_count` int NULL DEFAULT NULL,
+  PRIMARY KEY (`post_id`, `period`, `period_start`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for tiktok_profile_history
 -- ----------------------------
@@ -101,6 +170,7 @@ CREATE TABLE `tiktok_profile_history`  (
   `last_updated` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `user_id`(`user_id` ASC) USING BTREE,
+  INDEX `user_last_updated`(`user_id` ASC, `last_updated` ASC) USING BTREE,
   CONSTRAINT `tiktok_profile_history_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `tiktok_profiles` (`user_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
@@ -130,9 +200,32 @@ CREATE TABLE `tiktok_video_history`  (
   `timestamp` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `video_id`(`video_id` ASC) USING BTREE,
+  INDEX `video_timestamp`(`video_id` ASC, `timestamp` ASC) USING BTREE,
   CONSTRAINT `tiktok_video_history_ibfk_1` FOREIGN KEY (`video_id`) REFERENCES `tiktok_videos` (`video_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for tiktok_video_rollup
+-- ----------------------------
+DROP TABLE IF EXISTS `tiktok_video_rollup`;
+CREATE TABLE `tiktok_video_rollup`  (
+  `video_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `period` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `period_start` date NOT NULL,
+  `samples` int NOT NULL DEFAULT 0,
+  `last_at` datetime NULL DEFAULT NULL,
+  `min_view_count` int NULL DEFAULT NULL,
+  `max_view_count` int NULL DEFAULT NULL,
+  `last_view_count` int NULL DEFAULT NULL,
+  `min_like_count` int NULL DEFAULT NULL,
+  `max_like_count` int NULL DEFAULT NULL,
+  `last_like_count` int NULL DEFAULT NULL,
+  `min_comment_count` int NULL DEFAULT NULL,
+  `max_comment_count` int NULL DEFAULT NULL,
+  `last_comment_count` int NULL DEFAULT NULL,
+  PRIMARY KEY (`video_id`, `period`, `period_start`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for tiktok_videos
 -- ----------------------------
@@ -171,6 +264,7 @@ CREATE TABLE `youtube_channel_history`  (
   `last_updated` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `channel_id`(`channel_id` ASC) USING BTREE,
+  INDEX `channel_last_updated`(`channel_id` ASC, `last_updated` ASC) USING BTREE,
   CONSTRAINT `youtube_channel_history_ibfk_1` FOREIGN KEY (`channel_id`) REFERENCES `youtube_channels` (`channel_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB AUTO_INCREMENT = 13 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
@@ -201,9 +295,32 @@ CREATE TABLE `youtube_video_history`  (
   `last_updated` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`) USING BTREE,
   INDEX `video_id`(`video_id` ASC) USING BTREE,
+  INDEX `video_last_updated`(`video_id` ASC, `last_updated` ASC) USING BTREE,
   CONSTRAINT `youtube_video_history_ibfk_1` FOREIGN KEY (`video_id`) REFERENCES `youtube_videos` (`video_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB AUTO_INCREMENT = 6 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
 
+-- ----------------------------
+-- Table structure for youtube_video_rollup
+-- ----------------------------
+DROP TABLE IF EXISTS `youtube_video_rollup`;
+CREATE TABLE `youtube_video_rollup`  (
+  `video_id` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `period` varchar(10) CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci NOT NULL,
+  `period_start` date NOT NULL,
+  `samples` int NOT NULL DEFAULT 0,
+  `last_at` datetime NULL DEFAULT NULL,
+  `min_view_count` int NULL DEFAULT NULL,
+  `max_view_count` int NULL DEFAULT NULL,
+  `last_view_count` int NULL DEFAULT NULL,
+  `min_like_count` int NULL DEFAULT NULL,
+  `max_like_count` int NULL DEFAULT NULL,
+  `last_like_count` int NULL DEFAULT NULL,
+  `min_comment_count` int NULL DEFAULT NULL,
+  `max_comment_count` int NULL DEFAULT NULL,
+  `last_comment_count` int NULL DEFAULT NULL,
+  PRIMARY KEY (`video_id`, `period`, `period_start`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_0900_ai_ci ROW_FORMAT = Dynamic;
+
 -- ----------------------------
 -- Table structure for youtube_videos
 -- ----------------------------
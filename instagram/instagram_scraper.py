@@ -1,172 +1,256 @@
 import sys
 import os
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from instagrapi import Client
-from common.db import get_db_connection
-from common.config import INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD
+from common.db import get_pool
+from instagrapi.exceptions import UserNotFound
+from common.scheduler import DueScheduler
+from common.instagram_sessions import InstagramSessionPool
+from common.batch_writer import BatchWriter
+from common.bot_detection import BotDetector
+from common.metrics import calculate_metrics
+from common.snapshots import get_snapshot, compute_growth_rate, record_snapshot
+from common.instrumentation import get_instrumentation, start_exporter
+from common.change_detection import ChangeDetector
+from common.refresh_policy import posts_per_day
+from common.impact_score import refresh_rankings_if_due
+from common.spool import Spool
+from common.media_cursors import MediaCursors, newest
+from common.identity_cache import IdentityCache
+from common.config import INSTAGRAM_WORKERS
 
-def login_instagram():
-    cl = Client()
-    cl.login(INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD)
-    return cl
+# API requests made by one fetch_profile_and_posts call with a single page of posts, charged against
+# the account's budget up front; further pages and rename lookups are charged as they are made
+REQUESTS_PER_FETCH = 3
+
+bot_detector = BotDetector('instagram')
+instrumentation = get_instrumentation()
+
+# History rows are only written when the counters changed since the last refresh
+profile_changes = ChangeDetector('instagram', 'profile')
+post_changes = ChangeDetector('instagram', 'post')
+
+# Usernames are resolved to user IDs once instead of on every refresh
+identities = IdentityCache('instagram')
+
+# Posts are fetched incrementally: only pages newer than the newest tracked post
+media_cursors = MediaCursors('instagram')
+
+# Logged-in clients are reused across fetches instead of logging in per influencer
+session_pool = InstagramSessionPool()
+
+# Post rows are written in batches; instagram_post_data must be flushed before its history
+POST_STATEMENTS = {
+    "instagram_post_data": """
+        INSERT INTO instagram_post_data (
+            post_id, influencer_id, timestamp, caption, media_type, likes_count, comments_count
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            likes_count = VALUES(likes_count), comments_count = VALUES(comments_count)
+    """,
+    "instagram_post_data_history": """
+        INSERT INTO instagram_post_data_history (
+            post_id, influencer_id, timestamp, likes_count, comments_count
+        ) VALUES (%s, %s, %s, %s, %s)
+    """,
+}
 
 def fetch_instagram_data(username):
-    cl = login_instagram()
     try:
-        user_id = cl.user_id_from_username(username)
-        user_info = cl.user_info(user_id)
-        
-        profile_data = {
-            "followers_count": user_info.follower_count,
-            "following_count": user_info.following_count,
-            "media_count": user_info.media_count,
-            "profile_pic_url": str(user_info.profile_pic_url),
-            "bio": user_info.biography,
-            "website_url": str(user_info.external_url),
-            "is_verified": user_info.is_verified,
-            "account_type": user_info.account_type,
-        }
-        
-        recent_media = cl.user_medias(user_id, 10)
-        post_data = [{
-            "post_id": media.pk,
-            "timestamp": media.taken_at,
-            "caption": media.caption_text,
-            "media_type": media.media_type,
-            "likes_count": media.like_count,
-            "comments_count": media.comment_count
-        } for media in recent_media]
-        
-        return profile_data, post_data
+        # The cache is read once: the username lookup is only charged while the user ID is not cached
+        user_id = identities.cached(username)
+        cost = REQUESTS_PER_FETCH if user_id is None else REQUESTS_PER_FETCH - 1
+        with instrumentation.stage('instagram', 'fetch', username):
+            return session_pool.run(fetch_profile_and_posts, username, user_id, cost=cost)
     except Exception as e:
         print(f"Error fetching data for {username}: {e}")
+        instrumentation.count('errors', 'instagram')
         return None, None
 
-def detect_bot_activity(cursor, influencer_id, current_followers_count, total_likes, total_comments):
-    follower_spike = detect_follower_spike(cursor, influencer_id, current_followers_count)
-    engagement_spike = detect_sudden_engagement_spike(cursor, influencer_id)
-    return follower_spike or engagement_spike
-
-def detect_follower_spike(cursor, influencer_id, current_followers_count):
-    cursor.execute("""
-        SELECT followers_count FROM instagram_influencer_data_history 
-        WHERE influencer_id = %s ORDER BY timestamp DESC LIMIT 5
-    """, (influencer_id,))
-    history = cursor.fetchall()
-    if len(history) < 2:
-        return False
-
-    avg_followers = sum(row[0] for row in history[1:]) / (len(history) - 1)
-    return current_followers_count > avg_followers * 1.5
-
-def detect_sudden_engagement_spike(cursor, influencer_id):
-    cursor.execute("""
-        SELECT timestamp, likes_count, comments_count FROM instagram_post_data_history
-        WHERE influencer_id = %s ORDER BY timestamp DESC LIMIT 10
-    """, (influencer_id,))
-    history = cursor.fetchall()
-    if len(history) < 2:
-        return False
-
-    for i in range(1, len(history)):
-        time_diff = history[i-1][0] - history[i][0]
-        like_diff = history[i-1][1] - history[i][1]
-        comment_diff = history[i-1][2] - history[i][2]
-        if time_diff < timedelta(minutes=10) and (like_diff > 100 or comment_diff > 50):
-            return True
-    return False
+def resolve_user_id(cl, username):
+    """Look up the Instagram user ID of `username` and store it in the identity cache."""
+    return identities.lookup(username, cl.user_id_from_username)
 
-def update_influencer_data(cursor, influencer_id, username):
+def fetch_profile_and_posts(cl, username, user_id=None):
+    """Fetch profile and posts; `user_id` is the cached ID of the username, if any."""
+    if user_id is None:
+        user_id = resolve_user_id(cl, username)
+    try:
+        user_info = cl.user_info(user_id)
+    except UserNotFound:
+        identities.invalidate(username)  # Deleted account or stale ID, resolved again next time
+        raise
+    if user_info.username.lower() != username.lower():
+        # The cached ID belongs to an account that has been renamed since: look the username up again
+        identities.invalidate(username)
+        session_pool.charge(2)
+        user_id = resolve_user_id(cl, username)
+        user_info = cl.user_info(user_id)
+    
+    profile_data = {
+        "followers_count": user_info.follower_count,
+        "following_count": user_info.following_count,
+        "media_count": user_info.media_count,
+        "profile_pic_url": str(user_info.profile_pic_url),
+        "bio": user_info.biography,
+        "website_url": str(user_info.external_url),
+        "is_verified": user_info.is_verified,
+        "account_type": user_info.account_type,
+    }
+    
+    post_data = fetch_posts(cl, username, user_id, user_info.media_count)
+    return profile_data, post_data
+
+def fetch_posts(cl, username, user_id, media_count):
+    """Page through the user's posts (newest first) only as far as the account's refresh plan needs."""
+    state = media_cursors.get(username)
+    plan = media_cursors.plan(state, media_count)
+    tracked = set(state['tracked'])
+    post_data = []
+    reached_known = False
+    end_cursor = ""
+    while True:
+        if post_data:
+            session_pool.charge()  # The first page is part of REQUESTS_PER_FETCH
+        medias, end_cursor = cl.user_medias_paginated(user_id, media_cursors.window, end_cursor)
+        for media in medias:
+            post_data.append({
+                "post_id": media.pk,
+                "timestamp": media.taken_at,
+                "caption": media.caption_text,
+                "media_type": media.media_type,
+                "likes_count": media.like_count,
+                "comments_count": media.comment_count
+            })
+            reached_known = reached_known or media.pk in tracked
+        if not medias or not end_cursor or media_cursors.enough(plan, len(post_data), reached_known):
+            break
+    media_cursors.update(username, state, plan, media_count, [post["post_id"] for post in post_data])
+    return post_data
+
+def detect_bot_activity(previous, current_followers_count, total_likes, total_comments):
+    return bot_detector.detect_snapshot(previous, current_followers_count, total_likes, total_comments)
+
+def update_influencer_data(cursor, writer, influencer_id, username):
     profile_data, post_data = fetch_instagram_data(username)
     if profile_data:
-        if post_data:
-            last_post_timestamp = post_data[0]["timestamp"]
-            total_likes = sum(post["likes_count"] for post in post_data)
-            total_comments = sum(post["comments_count"] for post in post_data)
-            avg_likes = total_likes // len(post_data)
-            avg_comments = total_comments // len(post_data)
-            engagement_rate = (total_likes + total_comments) / profile_data["followers_count"] * 100 if profile_data["followers_count"] > 0 else 0
-        else:
-            last_post_timestamp, total_likes, total_comments, avg_likes, avg_comments, engagement_rate = None, 0, 0, 0, 0, 0
-
-        cursor.execute("SELECT followers_count FROM instagram_influencer_data_history WHERE influencer_id = %s ORDER BY timestamp DESC LIMIT 1", (influencer_id,))
-        previous_data = cursor.fetchone()
-        previous_followers_count = previous_data[0] if previous_data else 0
-        growth_rate = ((profile_data["followers_count"] - previous_followers_count) / previous_followers_count * 100
-                       if previous_followers_count > 0 else 0)
-
-        # Check for bot activity
-        bot_flag = detect_bot_activity(cursor, influencer_id, profile_data["followers_count"], total_likes, total_comments)
+        save_influencer_data(cursor, writer, influencer_id, username, profile_data, post_data)
+        return True
+    return False
+
+def save_influencer_data(cursor, writer, influencer_id, username, profile_data, post_data):
+    # Metrics cover the newest posts only, however many pages this refresh read
+    recent_posts = newest(post_data, "timestamp", media_cursors.window)
+    last_post_timestamp = recent_posts[0]["timestamp"] if recent_posts else None
+    with instrumentation.stage('instagram', 'metrics', username):
+        avg_likes, avg_comments, total_likes, total_comments, engagement_rate = calculate_metrics(
+            recent_posts, profile_data["followers_count"], "likes_count", "comments_count"
+        )
+
+    # Previous state comes from the snapshot table instead of sorting the history
+    with instrumentation.stage('instagram', 'db_read', username):
+        previous = get_snapshot(cursor, 'instagram', influencer_id)
+    growth_rate = compute_growth_rate(previous, profile_data["followers_count"])
+
+    # Check for bot activity
+    with instrumentation.stage('instagram', 'bot_detection', username):
+        bot_flag = detect_bot_activity(previous, profile_data["followers_count"], total_likes, total_comments)
 
+    with instrumentation.stage('instagram', 'db_write', username):
         # Insert a new record into the historical data table
-        cursor.execute("""
-            INSERT INTO instagram_influencer_data_history (
-                influencer_id, followers_count, following_count, media_count, profile_pic_url,
-                bio, website_url, is_verified, account_type, last_post_timestamp,
-                avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (influencer_id, profile_data["followers_count"], profile_data["following_count"], 
-              profile_data["media_count"], profile_data["profile_pic_url"], profile_data["bio"], 
-              profile_data["website_url"], profile_data["is_verified"], profile_data["account_type"], 
-              last_post_timestamp, avg_likes, avg_comments, engagement_rate, growth_rate, 
-              total_likes, total_comments, bot_flag))
-
-        # Insert each post data into instagram_post_data and its history
-        for post in post_data:
-            cursor.execute("""
-                INSERT INTO instagram_post_data (
-                    post_id, influencer_id, timestamp, caption, media_type, likes_count, comments_count
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    likes_count = %s, comments_count = %s
-            """, (post["post_id"], influencer_id, post["timestamp"], post["caption"], 
-                  post["media_type"], post["likes_count"], post["comments_count"],
-                  post["likes_count"], post["comments_count"]))
-            
-            # Insert historical data for each post
+        if profile_changes.changed(influencer_id, profile_data["followers_count"], profile_data["following_count"],
+                                   profile_data["media_count"], total_likes, total_comments):
             cursor.execute("""
-                INSERT INTO instagram_post_data_history (
-                    post_id, influencer_id, timestamp, likes_count, comments_count
-                ) VALUES (%s, %s, %s, %s, %s)
-            """, (post["post_id"], influencer_id, datetime.now(), post["likes_count"], post["comments_count"]))
+                INSERT INTO instagram_influencer_data_history (
+                    influencer_id, followers_count, following_count, media_count, profile_pic_url,
+                    bio, website_url, is_verified, account_type, last_post_timestamp,
+                    avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (influencer_id, profile_data["followers_count"], profile_data["following_count"], 
+                  profile_data["media_count"], profile_data["profile_pic_url"], profile_data["bio"], 
+                  profile_data["website_url"], profile_data["is_verified"], profile_data["account_type"], 
+                  last_post_timestamp, avg_likes, avg_comments, engagement_rate, growth_rate, 
+                  total_likes, total_comments, bot_flag))
+        snapshot = record_snapshot(cursor, 'instagram', influencer_id, previous, influencer_id,
+                                   profile_data["followers_count"], total_likes, total_comments, engagement_rate,
+                                   growth_rate, bot_flag, posts_per_day(post["timestamp"] for post in recent_posts))
+
+        # Queue each post and its history row for the batched writer
+        for post in post_data:
+            writer.add("instagram_post_data", (
+                post["post_id"], influencer_id, post["timestamp"], post["caption"],
+                post["media_type"], post["likes_count"], post["comments_count"]))
+            if post_changes.changed(post["post_id"], post["likes_count"], post["comments_count"]):
+                writer.add("instagram_post_data_history", (
+                    post["post_id"], influencer_id, datetime.now(), post["likes_count"], post["comments_count"]))
+
+    print(f"Inserted historical data for Instagram user {username} with bot_flag={bot_flag}")
+    return snapshot
 
-        print(f"Inserted historical data for Instagram user {username} with bot_flag={bot_flag}")
+def save_spooled(cursor, writer, influencer_id, username, payload):
+    """Save a (profile_data, post_data) payload from the spool."""
+    return save_influencer_data(cursor, writer, influencer_id, username, *payload)
 
-def monitor_and_update_data():
-    db_connection = get_db_connection()
-    cursor = db_connection.cursor()
+def monitor_and_update_data(max_cycles=None):
+    """Refresh due influencers forever, or for max_cycles cycles (used by the benchmark)."""
+    pool = get_pool()
+    # Fetched payloads survive a crash or a failed write and are replayed instead of refetched
+    spool = Spool('instagram')
+    writer = BatchWriter(pool, POST_STATEMENTS, platform='instagram', on_flush=spool.ack_saved)
+    scheduler = DueScheduler(['instagram'])
+    start_exporter('instagram')
+    executor = ThreadPoolExecutor(max_workers=INSTAGRAM_WORKERS)
+    cycles = 0
 
     while True:
-        # Hole alle Influencer mit einem Instagram-Benutzernamen aus der `influencers`-Tabelle
-        cursor.execute("SELECT influencer_id, Instagram_Username FROM influencers WHERE Instagram_Username IS NOT NULL")
-        influencers = cursor.fetchall()
+        # Write what the last run or cycle fetched but could not save, before loading the due influencers
+        spool.replay(pool, writer, save_spooled)
+        # Load due influencers with one set-based query instead of one query per influencer
+        if scheduler.needs_reload():
+            with pool.cursor() as cursor:
+                scheduler.load(cursor)
 
-        for influencer in influencers:
-            influencer_id, username = influencer
+        due = scheduler.pop_due()
+        started = time.monotonic()
+        instrumentation.start_cycle('instagram')
+        # Fetch in worker threads; this thread is the only one writing to the database
+        futures = {executor.submit(fetch_instagram_data, username): (platform, influencer_id, username)
+                   for platform, influencer_id, username in due}
+        for future in as_completed(futures):
+            platform, influencer_id, username = futures[future]
+            profile_data, post_data = future.result()
+            if profile_data:
+                # Spooled first, then one pooled connection and transaction per influencer
+                snapshot = spool.save(pool, writer, save_spooled, influencer_id, username, (profile_data, post_data))
+                # Next refresh after the account's adaptive interval; a failed write is replayed, not refetched
+                scheduler.reschedule(platform, influencer_id, username, True, snapshot and snapshot['refresh_interval'])
+            else:
+                scheduler.reschedule(platform, influencer_id, username, False)
 
-            # Check the last update time in the history table
-            cursor.execute("""
-                SELECT timestamp FROM instagram_influencer_data_history 
-                WHERE influencer_id = %s 
-                ORDER BY timestamp DESC 
-                LIMIT 1
-            """, (influencer_id,))
-            last_update = cursor.fetchone()
-
-            # Update data if 24 hours have passed since last update
-            if not last_update or (datetime.now() - last_update[0]) >= timedelta(hours=24):
-                update_influencer_data(cursor, influencer_id, username)
-
-        db_connection.commit()
-        time.sleep(600)  # Check every hour if any influencer needs updating
-
-    cursor.close()
-    db_connection.close()
+        try:
+            writer.flush()
+            refresh_rankings_if_due(pool)
+        except Exception as e:
+            # Buffered rows are retried with the next flush, their payloads stay in the spool until then
+            print(f"End-of-cycle write failed, retrying next cycle: {e}")
+            instrumentation.count('errors', 'instagram')
+        if due:
+            print(f"Updated {len(due)} Instagram users in {time.monotonic() - started:.1f}s "
+                  f"with {INSTAGRAM_WORKERS} workers")
+        print(f"Post writes: {writer.report()}")
+        print(f"History: {profile_changes.report()}, {post_changes.report()}")
+        print(f"Post refreshes: {media_cursors.report()}")
+        print(f"User IDs: {identities.report()}")
+        instrumentation.end_cycle('instagram')
+        cycles += 1
+        if max_cycles and cycles >= max_cycles:
+            break
+        scheduler.wait()  # Sleep until the next influencer is due
 
 if __name__ == "__main__":
     monitor_and_update_data()
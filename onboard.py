@@ -0,0 +1,282 @@
+# onboard.py
+"""Bulk onboarding of new influencers from a CSV roster.
+
+    py onboard.py roster.csv
+    py onboard.py roster.csv --dry-run --batch-size 200
+
+The CSV needs a header with at least one of the columns instagram, tiktok
+and youtube (the influencers column names Instagram_Username,
+TikTok_Username and YouTube_ChannelID work too), one influencer per row.
+Accounts are resolved to platform IDs in rate-limited parallel batches:
+Instagram through the session pool and its request budgets, TikTok through
+the session scheduler, YouTube 50 channels per channels.list call. The IDs
+are stored in the identity caches, so the first refresh skips the lookup,
+and every batch is inserted with one multi-row INSERT. Accounts are matched
+one by one: new accounts of an influencer that is already tracked (found by
+another account of the row) are added to that influencer. Rows with an
+account that could not be resolved, or whose accounts belong to different
+influencers, are not imported at all but written to <roster>.rejected.csv,
+so they can be fixed and imported again.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import contextlib
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the platform folders importable as packages when started from anywhere
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from common.db import get_pool
+from common.scheduler import ACCOUNT_COLUMNS
+from common.config import ONBOARDING_BATCH_SIZE, INSTAGRAM_WORKERS, TIKTOK_CONCURRENCY, TIKTOK_MAX_ATTEMPTS
+
+PLATFORMS = tuple(ACCOUNT_COLUMNS)
+
+# Accepted CSV headers per platform (compared in lower case)
+HEADERS = {platform: {platform, column.lower()} for platform, column in ACCOUNT_COLUMNS.items()}
+
+INSERT_INFLUENCERS = f"""
+    INSERT IGNORE INTO influencers ({', '.join(ACCOUNT_COLUMNS.values())})
+    VALUES ({', '.join(['%s'] * len(ACCOUNT_COLUMNS))})
+"""
+
+# Adds an account to a tracked influencer, unless the platform got an account in the meantime
+ATTACH_ACCOUNT = """
+    UPDATE influencers SET {column} = %s WHERE influencer_id = %s AND {column} IS NULL
+"""
+
+
+def normalize(value):
+    return (value or '').strip().lstrip('@')
+
+
+def read_roster(path):
+    """Rows of the CSV as {platform: account}; empty cells are left out."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = {header: platform for header in reader.fieldnames or []
+                   for platform, names in HEADERS.items() if header.strip().lower() in names}
+        if not columns:
+            raise ValueError(f"{path} has none of the columns {', '.join(PLATFORMS)}")
+        rows = []
+        for row in reader:
+            accounts = {platform: normalize(row[header]) for header, platform in columns.items()
+                        if normalize(row[header])}
+            if accounts:
+                rows.append(accounts)
+    return rows
+
+
+def existing_accounts(cursor):
+    """Tracked accounts as ({platform: {account (lower case): influencer_id}}, {influencer_id: {platform: account}})."""
+    cursor.execute(f"SELECT influencer_id, {', '.join(ACCOUNT_COLUMNS.values())} FROM influencers")
+    owners = {platform: {} for platform in PLATFORMS}
+    influencers = {}
+    for influencer_id, *row in cursor.fetchall():
+        influencers[influencer_id] = {platform: account for platform, account in zip(PLATFORMS, row) if account}
+        for platform, account in influencers[influencer_id].items():
+            owners[platform][account.lower()] = influencer_id
+    return owners, influencers
+
+
+def plan_roster(rows, owners, influencers):
+    """Match roster rows against the tracked accounts, account by account.
+
+    Returns (work, known, duplicates, rejected): work holds (influencer_id,
+    new accounts, row) with influencer_id None for new influencers; known
+    counts rows whose accounts are all tracked already, duplicates rows
+    that repeat accounts of an earlier roster row.
+    """
+    work = []
+    known = duplicates = 0
+    rejected = []
+    claimed = {platform: set() for platform in PLATFORMS}  # Accounts taken by earlier roster rows
+    for row in rows:
+        if any(account.lower() in claimed[platform] for platform, account in row.items()):
+            duplicates += 1
+            continue
+        found = {owners[platform].get(account.lower()) for platform, account in row.items()} - {None}
+        new = {platform: account for platform, account in row.items() if account.lower() not in owners[platform]}
+        if len(found) > 1:
+            rejected.append({**row, 'reason': "accounts belong to different influencers"})
+            continue
+        influencer_id = found.pop() if found else None
+        if influencer_id is not None:
+            taken = [platform for platform in new if platform in influencers[influencer_id]]
+            if taken:
+                rejected.append({**row, 'reason': f"influencer {influencer_id} already has another account "
+                                                  f"on {', '.join(taken)}"})
+                continue
+        if not new:
+            known += 1
+            continue
+        for platform, account in row.items():
+            claimed[platform].add(account.lower())
+        work.append((influencer_id, new, row))
+    return work, known, duplicates, rejected
+
+
+def resolve_instagram(usernames):
+    """{username: user ID or None}, resolved on INSTAGRAM_WORKERS threads within the accounts' request budgets."""
+    from instagram import instagram_scraper
+
+    def resolve(username):
+        user_id = instagram_scraper.identities.cached(username)
+        if user_id is not None:
+            return user_id
+        try:
+            return instagram_scraper.session_pool.run(instagram_scraper.resolve_user_id, username)
+        except Exception as e:
+            print(f"Could not resolve Instagram user {username}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=INSTAGRAM_WORKERS) as executor:
+        return dict(zip(usernames, executor.map(resolve, usernames)))
+
+
+def resolve_youtube(channel_ids):
+    """{channel ID: channel ID or None}; checks 50 channels per channels.list call."""
+    from youtube import youtube_scraper
+
+    try:
+        found = youtube_scraper.fetch_channel_statistics(channel_ids)
+    except Exception as e:
+        print(f"Could not look up {len(channel_ids)} YouTube channels: {e}")
+        found = {}
+    return {channel_id: channel_id if channel_id in found else None for channel_id in channel_ids}
+
+
+@contextlib.asynccontextmanager
+async def tiktok_resolver():
+    """Yields resolve(usernames) -> {username: identity or None} on a shared set of TikTok sessions."""
+    from tiktok import tiktok_scraper
+
+    async with tiktok_scraper.TikTokApi() as api:
+        ms_tokens = tiktok_scraper.ms_tokens
+        await api.create_sessions(ms_tokens=ms_tokens, num_sessions=len(ms_tokens), sleep_after=3)
+        sessions = tiktok_scraper.SessionScheduler(len(ms_tokens))
+        semaphore = asyncio.Semaphore(TIKTOK_CONCURRENCY)
+
+        async def resolve_one(username):
+            async with semaphore:
+                for _ in range(TIKTOK_MAX_ATTEMPTS):
+                    session_index = await sessions.acquire()
+                    try:
+                        identity = await tiktok_scraper.resolve_identity(api, username, session_index)
+                    except tiktok_scraper.RATE_LIMIT_ERRORS:
+                        sessions.rate_limited(session_index)
+                        continue
+                    except Exception as e:
+                        print(f"Could not resolve TikTok user {username}: {e}")
+                        return None
+                    sessions.succeeded(session_index)
+                    return identity
+            print(f"Giving up on TikTok user {username} after {TIKTOK_MAX_ATTEMPTS} attempts")
+            return None
+
+        async def resolve(usernames):
+            return dict(zip(usernames, await asyncio.gather(*(resolve_one(username) for username in usernames))))
+
+        yield resolve
+
+
+def insert_influencers(pool, rows):
+    """Insert (instagram, tiktok, youtube) tuples with one multi-row INSERT per 1000 rows."""
+    with pool.cursor() as cursor:
+        for i in range(0, len(rows), 1000):
+            cursor.executemany(INSERT_INFLUENCERS, rows[i:i + 1000])
+
+
+def attach_accounts(pool, attachments):
+    """Add (influencer_id, {platform: account}) accounts to tracked influencers."""
+    with pool.cursor() as cursor:
+        for platform, column in ACCOUNT_COLUMNS.items():
+            params = [(accounts[platform], influencer_id) for influencer_id, accounts in attachments
+                      if platform in accounts]
+            if params:
+                cursor.executemany(ATTACH_ACCOUNT.format(column=column), params)
+
+
+def write_rejected(path, rejected):
+    rejected_path = os.path.splitext(path)[0] + '.rejected.csv'
+    with open(rejected_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(PLATFORMS) + ['reason'])
+        writer.writeheader()
+        writer.writerows(rejected)
+    print(f"Wrote {len(rejected)} rejected rows to {rejected_path}")
+
+
+async def onboard(path, dry_run=False, batch_size=ONBOARDING_BATCH_SIZE):
+    pool = get_pool()
+    rows = read_roster(path)
+    with pool.cursor() as cursor:
+        owners, influencers = existing_accounts(cursor)
+
+    work, known, duplicates, rejected = plan_roster(rows, owners, influencers)
+    new_influencers = sum(1 for influencer_id, _, _ in work if influencer_id is None)
+    print(f"{path}: {new_influencers} new influencers, {len(work) - new_influencers} tracked influencers "
+          f"with new accounts, {known} already tracked, {duplicates} duplicates, {len(rejected)} conflicts")
+
+    loop = asyncio.get_running_loop()
+    inserted = attached = 0
+    started = time.monotonic()
+    async with contextlib.AsyncExitStack() as stack:
+        resolvers = {
+            'instagram': lambda accounts: loop.run_in_executor(None, resolve_instagram, accounts),
+            'youtube': lambda accounts: loop.run_in_executor(None, resolve_youtube, accounts),
+        }
+        if any('tiktok' in new for _, new, _ in work):
+            resolvers['tiktok'] = await stack.enter_async_context(tiktok_resolver())
+
+        for start in range(0, len(work), batch_size):
+            batch = work[start:start + batch_size]
+            # The platforms of a batch are resolved at the same time; tracked accounts are not looked up again
+            platforms = [platform for platform in PLATFORMS if any(platform in new for _, new, _ in batch)]
+            results = await asyncio.gather(*(resolvers[platform]([new[platform] for _, new, _ in batch
+                                                                  if platform in new])
+                                             for platform in platforms))
+            resolved = dict(zip(platforms, results))
+
+            inserts = []
+            attachments = []
+            for influencer_id, new, row in batch:
+                failed = [platform for platform, account in new.items() if resolved[platform].get(account) is None]
+                if failed:
+                    # A partial row would be skipped as already tracked when the fixed roster is imported again
+                    rejected.append({**row, 'reason': f"not found: {', '.join(failed)}"})
+                elif influencer_id is None:
+                    inserts.append(tuple(new.get(platform) for platform in PLATFORMS))
+                else:
+                    attachments.append((influencer_id, new))
+            if not dry_run:
+                if inserts:
+                    insert_influencers(pool, inserts)
+                if attachments:
+                    attach_accounts(pool, attachments)
+            inserted += len(inserts)
+            attached += len(attachments)
+            print(f"Onboarded {start + len(batch)}/{len(work)}: {len(inserts)} inserted, {len(attachments)} "
+                  f"extended in this batch ({time.monotonic() - started:.1f}s)")
+
+    print(f"{'Would insert' if dry_run else 'Inserted'} {inserted} influencers and "
+          f"{'would add' if dry_run else 'added'} accounts to {attached} tracked influencers, "
+          f"{len(rejected)} rejected rows")
+    if rejected:
+        write_rejected(path, rejected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import new influencers from a CSV roster")
+    parser.add_argument('roster', help="CSV with instagram, tiktok and/or youtube columns")
+    parser.add_argument('--dry-run', action='store_true', help="resolve the accounts but insert nothing")
+    parser.add_argument('--batch-size', type=int, default=ONBOARDING_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(onboard(args.roster, args.dry_run, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
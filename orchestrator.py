@@ -0,0 +1,304 @@
+import abc
+import sys
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the platform folders importable as packages when started from anywhere
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from common.db import get_pool
+from common.scheduler import DueScheduler
+from common.batch_writer import BatchWriter
+from common.instrumentation import start_exporter
+from common.impact_score import refresh_rankings_if_due
+from common.spool import Spool
+from common.config import ORCHESTRATOR_PLATFORMS, INSTAGRAM_WORKERS, TIKTOK_CONCURRENCY
+
+# Maximum wait before a partial YouTube batch is sent
+YOUTUBE_BATCH_WAIT = 0.5
+
+
+class PlatformAdapter(abc.ABC):
+    """Wraps one platform's scraper functions for the orchestrator.
+
+    fetch() runs on the event loop and returns a payload (or None if the
+    account could not be fetched); save() runs on the database thread,
+    writes the payload with the given cursor and the shared writer and
+    returns the account's new snapshot.
+    """
+
+    platform = None
+    concurrency = 1
+    statements = {}
+    change_detectors = ()
+    media_cursors = None
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abc.abstractmethod
+    async def fetch(self, account):
+        ...
+
+    @abc.abstractmethod
+    def save(self, cursor, writer, influencer_id, account, payload):
+        ...
+
+    def tracked(self, count):
+        """Called with the number of tracked accounts after the influencers were (re)loaded."""
+
+    def history_report(self):
+        """Written vs. unchanged-skipped history rows since the last report."""
+        return ", ".join(detector.report() for detector in self.change_detectors)
+
+
+class InstagramAdapter(PlatformAdapter):
+    platform = 'instagram'
+    concurrency = INSTAGRAM_WORKERS
+
+    def __init__(self):
+        from instagram import instagram_scraper
+        self.scraper = instagram_scraper
+        self.statements = instagram_scraper.POST_STATEMENTS
+        self.change_detectors = (instagram_scraper.profile_changes, instagram_scraper.post_changes)
+        self.media_cursors = instagram_scraper.media_cursors
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    async def fetch(self, username):
+        # instagrapi is synchronous, so fetches run on a thread pool
+        profile_data, post_data = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.scraper.fetch_instagram_data, username)
+        return (profile_data, post_data) if profile_data else None
+
+    def save(self, cursor, writer, influencer_id, username, payload):
+        return self.scraper.save_influencer_data(cursor, writer, influencer_id, username, *payload)
+
+    async def stop(self):
+        self.executor.shutdown(wait=False)
+
+
+class TikTokAdapter(PlatformAdapter):
+    platform = 'tiktok'
+    concurrency = TIKTOK_CONCURRENCY
+
+    def __init__(self):
+        from tiktok import tiktok_scraper
+        self.scraper = tiktok_scraper
+        self.statements = tiktok_scraper.VIDEO_STATEMENTS
+        self.change_detectors = (tiktok_scraper.profile_changes, tiktok_scraper.video_changes)
+        self.media_cursors = tiktok_scraper.media_cursors
+        self.api = None
+        self.sessions = None
+
+    async def start(self):
+        self.api = self.scraper.TikTokApi()
+        await self.api.__aenter__()
+        await self.api.create_sessions(ms_tokens=self.scraper.ms_tokens,
+                                       num_sessions=len(self.scraper.ms_tokens), sleep_after=3)
+        self.sessions = self.scraper.SessionScheduler(len(self.scraper.ms_tokens))
+
+    async def stop(self):
+        if self.api:
+            await self.api.__aexit__(None, None, None)
+
+    async def fetch(self, tiktok_username):
+        return await self.scraper.fetch_influencer(self.api, self.sessions, tiktok_username)
+
+    def save(self, cursor, writer, influencer_id, tiktok_username, payload):
+        return self.scraper.update_tiktok_data(cursor, writer, influencer_id, *payload)
+
+
+class YouTubeAdapter(PlatformAdapter):
+    """Collects concurrent fetches into batches so channel statistics are requested 50 IDs at a time."""
+
+    platform = 'youtube'
+
+    def __init__(self):
+        from youtube import youtube_scraper
+        self.scraper = youtube_scraper
+        self.statements = youtube_scraper.VIDEO_STATEMENTS
+        self.change_detectors = (youtube_scraper.channel_changes, youtube_scraper.video_changes)
+        self.media_cursors = youtube_scraper.media_cursors
+        self.concurrency = youtube_scraper.MAX_IDS_PER_CALL
+        # The googleapiclient client is not thread-safe, so API calls stay on one thread
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = []
+        self._timer = None
+
+    async def fetch(self, channel_id):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((channel_id, future))
+        if len(self._pending) >= self.concurrency:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(YOUTUBE_BATCH_WAIT, self._dispatch)
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._fetch_batch(batch))
+
+    async def _fetch_batch(self, batch):
+        channel_ids = [channel_id for channel_id, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.scraper.fetch_youtube_data_batch, channel_ids)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for channel_id, future in batch:
+            channel_data, post_data = results[channel_id]
+            future.set_result((channel_data, post_data) if channel_data else None)
+
+    def tracked(self, count):
+        self.scraper.size_cache(count)
+
+    def save(self, cursor, writer, influencer_id, channel_id, payload):
+        return self.scraper.update_channel_data(cursor, writer, influencer_id, channel_id, *payload)
+
+    async def stop(self):
+        self.executor.shutdown(wait=False)
+
+
+ADAPTERS = {
+    'instagram': InstagramAdapter,
+    'tiktok': TikTokAdapter,
+    'youtube': YouTubeAdapter,
+}
+
+
+class Orchestrator:
+    """Runs all platform adapters on one event loop with a shared pool and writer.
+
+    Every platform has its own scheduler and scheduling loop, so a platform
+    that is slowed down (e.g. Instagram waiting for its request budgets)
+    does not hold back the due accounts of the others. The shared writer is
+    flushed on a timer instead of at the end of a combined cycle.
+    """
+
+    def __init__(self, platforms=ORCHESTRATOR_PLATFORMS):
+        self.adapters = {platform: ADAPTERS[platform]() for platform in platforms}
+        self.pool = get_pool()
+        statements = {}
+        for adapter in self.adapters.values():
+            statements.update(adapter.statements)
+        # One spool per platform (the same files as the standalone scrapers), acknowledged after each flush
+        self.spools = {platform: Spool(platform) for platform in self.adapters}
+        self.writer = BatchWriter(self.pool, statements, on_flush=self._ack_spools)
+        self.schedulers = {platform: DueScheduler([platform]) for platform in self.adapters}
+        self.instrumentation = start_exporter('orchestrator')
+        self.semaphores = {}
+        # A single database thread keeps the event loop free and the shared writer serial
+        self.db_executor = ThreadPoolExecutor(max_workers=1)
+
+    def run_db(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.db_executor, fn, *args)
+
+    def _load_due(self, platform):
+        scheduler = self.schedulers[platform]
+        with self.pool.cursor() as cursor:
+            scheduler.load(cursor)
+        self.adapters[platform].tracked(scheduler.tracked(platform))
+
+    def _ack_spools(self):
+        for spool in self.spools.values():
+            spool.ack_saved()
+
+    def _replay(self, platform):
+        """Write the payloads that were fetched but not saved by the last run or cycle."""
+        self.spools[platform].replay(self.pool, self.writer, self.adapters[platform].save)
+
+    def _save(self, adapter, influencer_id, account, payload):
+        return self.spools[adapter.platform].save(self.pool, self.writer, adapter.save, influencer_id, account, payload)
+
+    def _flush(self):
+        flushed = self.writer.flush()
+        refresh_rankings_if_due(self.pool)
+        return flushed
+
+    async def process(self, platform, influencer_id, account):
+        """Fetch and save one account; returns (fetched, snapshot), the snapshot is None if the write failed."""
+        adapter = self.adapters[platform]
+        async with self.semaphores[platform]:
+            payload = await adapter.fetch(account)
+        if payload is None:
+            return False, None
+        return True, await self.run_db(self._save, adapter, influencer_id, account, payload)
+
+    async def run_cycle(self, platform):
+        """Fetch and save all due accounts of one platform, then reschedule them."""
+        scheduler = self.schedulers[platform]
+        adapter = self.adapters[platform]
+        due = scheduler.pop_due()
+        started = time.monotonic()
+        self.instrumentation.start_cycle(platform)
+        results = await asyncio.gather(
+            *(self.process(platform, influencer_id, account) for platform, influencer_id, account in due),
+            return_exceptions=True
+        )
+        failed = 0
+        for (platform, influencer_id, account), result in zip(due, results):
+            if isinstance(result, Exception):
+                print(f"Error updating {platform} account {account}: {result}")
+                self.instrumentation.count('errors', platform)
+                result = (False, None)
+            fetched, snapshot = result
+            # Payloads that could not be written stay spooled and are replayed instead of refetched
+            scheduler.reschedule(platform, influencer_id, account, fetched,
+                                 snapshot and snapshot['refresh_interval'])
+            failed += snapshot is None
+        if due:
+            print(f"{platform} cycle finished in {time.monotonic() - started:.1f}s - {len(due)} ({failed} failed)")
+            print(f"{platform} history: {adapter.history_report()}")
+            if adapter.media_cursors:
+                print(f"{platform} media refreshes: {adapter.media_cursors.report()}")
+        self.instrumentation.end_cycle(platform)
+
+    async def run_platform(self, platform):
+        """Scheduling loop of one platform: reload, fetch what is due, sleep until the next account is due."""
+        scheduler = self.schedulers[platform]
+        while True:
+            await self.run_db(self._replay, platform)
+            if scheduler.needs_reload():
+                await self.run_db(self._load_due, platform)
+            await self.run_cycle(platform)
+            await asyncio.sleep(scheduler.seconds_until_next())
+
+    async def flush_periodically(self):
+        """Flush the shared writer every flush interval, independent of the platform loops."""
+        while True:
+            await asyncio.sleep(self.writer.flush_interval)
+            try:
+                if await self.run_db(self._flush):
+                    print(f"Writes: {self.writer.report()}")
+            except Exception as e:
+                # Buffered rows are retried with the next flush, their payloads stay in the spools until then
+                print(f"Periodic write failed, retrying with the next flush: {e}")
+                self.instrumentation.count('errors', 'all')
+
+    async def run(self):
+        self.semaphores = {platform: asyncio.Semaphore(adapter.concurrency)
+                           for platform, adapter in self.adapters.items()}
+        for adapter in self.adapters.values():
+            await adapter.start()
+        try:
+            await asyncio.gather(self.flush_periodically(),
+                                 *(self.run_platform(platform) for platform in self.adapters))
+        finally:
+            for adapter in self.adapters.values():
+                await adapter.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(Orchestrator().run())
@@ -0,0 +1,2 @@
+py orchestrator.py
+pause
\ No newline at end of file
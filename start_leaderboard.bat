@@ -0,0 +1,2 @@
+py common/impact_score.py --top
+pause
\ No newline at end of file
@@ -0,0 +1,2 @@
+py onboard.py %*
+pause
\ No newline at end of file
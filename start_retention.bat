@@ -0,0 +1,2 @@
+py common/retention.py
+pause
\ No newline at end of file
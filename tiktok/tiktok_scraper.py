@@ -2,104 +2,358 @@ import sys
 import os
 import time
 import asyncio
-from datetime import datetime, timedelta
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from concurrent.futures import ThreadPoolExecutor
 from TikTokApi import TikTokApi
-from common.db import get_db_connection
-from common.config import TIKTOK_MSTOKEN
+from TikTokApi.exceptions import CaptchaException, EmptyResponseException, NotFoundException
+from common.db import get_pool
+from common.scheduler import DueScheduler
+from common.batch_writer import BatchWriter
+from common.bot_detection import BotDetector
+from common.metrics import calculate_metrics
+from common.snapshots import get_snapshot, compute_growth_rate, record_snapshot
+from common.instrumentation import get_instrumentation, start_exporter
+from common.change_detection import ChangeDetector
+from common.refresh_policy import posts_per_day
+from common.impact_score import refresh_rankings_if_due
+from common.spool import Spool
+from common.media_cursors import MediaCursors, newest
+from common.identity_cache import IdentityCache
+from common.config import TIKTOK_MSTOKENS, TIKTOK_CONCURRENCY, TIKTOK_RATE_LIMIT_BACKOFF, TIKTOK_MAX_ATTEMPTS
 
-# ms_token aus den Umgebungsvariablen lesen
-ms_token = os.environ.get(TIKTOK_MSTOKEN, None)
+# ms_tokens aus den Umgebungsvariablen lesen, eine Session pro Token
+ms_tokens = [os.environ.get(name, None) for name in TIKTOK_MSTOKENS]
 
-async def fetch_tiktok_profile(api, username):
+bot_detector = BotDetector('tiktok')
+instrumentation = get_instrumentation()
+
+# Historien-Einträge werden nur geschrieben, wenn sich die Zähler seit dem letzten Abruf geändert haben
+profile_changes = ChangeDetector('tiktok', 'profile')
+video_changes = ChangeDetector('tiktok', 'video')
+
+# Videos werden inkrementell abgerufen: nur bis zum neuesten bereits verfolgten Video
+media_cursors = MediaCursors('tiktok')
+
+# user_id und sec_uid pro Benutzername, für das Onboarding und die Videoabfrage
+identities = IdentityCache('tiktok')
+
+# Fehler, mit denen TikTok auf zu viele Anfragen einer Session reagiert
+RATE_LIMIT_ERRORS = (CaptchaException, EmptyResponseException)
+
+
+class SessionScheduler:
+    """Verteilt Anfragen reihum auf die TikTok-Sessions und pausiert Sessions nach Rate-Limits."""
+
+    def __init__(self, num_sessions, backoff=TIKTOK_RATE_LIMIT_BACKOFF):
+        self.backoff = backoff
+        self.blocked_until = [0.0] * num_sessions
+        self.failures = [0] * num_sessions
+        self._next = 0
+
+    async def acquire(self):
+        """Liefert den Index der nächsten freien Session und wartet, falls alle pausiert sind."""
+        count = len(self.blocked_until)
+        order = [(self._next + i) % count for i in range(count)]
+        session_index = min(order, key=lambda i: self.blocked_until[i])
+        self._next = (session_index + 1) % count
+        delay = self.blocked_until[session_index] - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return session_index
+
+    def succeeded(self, session_index):
+        self.failures[session_index] = 0
+
+    def rate_limited(self, session_index):
+        # Exponentielles Backoff pro Session, höchstens eine Stunde
+        self.failures[session_index] += 1
+        delay = min(self.backoff * 2 ** (self.failures[session_index] - 1), 3600)
+        self.blocked_until[session_index] = time.monotonic() + delay
+        print(f"TikTok session {session_index} rate limited, pausing for {delay:.0f}s")
+
+async def fetch_tiktok_profile(api, username, session_index=None):
     """Abrufen von Profilinformationen und Videos für einen TikTok-Benutzer."""
     user = api.user(username=username)
-    profile_data = await user.info()
+    instrumentation.count('api_calls', 'tiktok')
+    try:
+        profile_data = await user.info(session_index=session_index)
+    except NotFoundException:
+        identities.invalidate(username)  # Gelöschter oder umbenannter Account
+        raise
     print(profile_data)
 
-    user_id = profile_data.user_id
-    nickname = profile_data.nickname
-    follower_count = profile_data.stats.follower_count
-    video_count = profile_data.stats.video_count
+    # user.info() liefert die rohe Antwort: {"userInfo": {"user": {...}, "stats": {...}}}
+    user_info = profile_data['userInfo']['user']
+    stats = profile_data['userInfo']['stats']
+    user_id = user_info['id']
+    nickname = user_info['nickname']
+    follower_count = stats['followerCount']
+    video_count = stats['videoCount']
+
+    # Der Profilabruf liefert die Identität ohnehin mit; gespeichert wird nur, wenn sie sich geändert hat
+    # (gehört der Benutzername inzwischen einem anderen Account, wird der Eintrag so ersetzt)
+    identity = {'user_id': user_id, 'sec_uid': user_info.get('secUid') or getattr(user, 'sec_uid', None)}
+    if identities.get(username) != identity:
+        identities.set(username, identity)
 
     return {
+        "username": username,
         "user_id": user_id,
+        "sec_uid": identity['sec_uid'],
         "nickname": nickname,
         "follower_count": follower_count,
         "video_count": video_count,
     }
 
-async def fetch_tiktok_videos(api, user_id, count=5):
-    """Abrufen von Video-Informationen für einen bestimmten TikTok-Benutzer."""
+async def resolve_identity(api, username, session_index=None):
+    """user_id und sec_uid eines Benutzernamens, aus dem Cache oder über einen Profilabruf."""
+    identity = identities.get(username)
+    if identity is None:
+        await fetch_tiktok_profile(api, username, session_index)
+        identity = identities.get(username)
+    return identity
+
+async def fetch_tiktok_videos(api, user_id, video_count=None, session_index=None, sec_uid=None):
+    """Abrufen von Video-Informationen für einen bestimmten TikTok-Benutzer.
+
+    Die Videos (neueste zuerst) werden nur so weit gelesen, wie der Abrufplan des Accounts es verlangt.
+    """
+    state = media_cursors.get(user_id)
+    plan = media_cursors.plan(state, video_count)
+    tracked = set(state['tracked'])
     videos = []
-    async for video in api.user(user_id=user_id).videos(count=count):
+    reached_known = False
+    instrumentation.count('api_calls', 'tiktok')
+    # Die Videoliste wird über die sec_uid abgefragt; ist sie bekannt, muss sie nicht erst nachgeschlagen werden
+    user = api.user(user_id=user_id, sec_uid=sec_uid)
+    async for video in user.videos(count=media_cursors.depth, session_index=session_index):
+        # TikTokApi liefert create_time als datetime und stats als Dict (bei statsV2 mit Zahlen als Strings)
         videos.append({
             "video_id": video.id,
-            "description": video.desc,
-            "create_time": datetime.fromtimestamp(video.create_time),
-            "view_count": video.stats.play_count,
-            "like_count": video.stats.digg_count,
-            "comment_count": video.stats.comment_count,
+            "description": video.as_dict.get("desc"),
+            "create_time": video.create_time,
+            "view_count": int(video.stats.get("playCount", 0)),
+            "like_count": int(video.stats.get("diggCount", 0)),
+            "comment_count": int(video.stats.get("commentCount", 0)),
         })
+        reached_known = reached_known or video.id in tracked
+        if media_cursors.enough(plan, len(videos), reached_known):
+            break
+    media_cursors.update(user_id, state, plan, video_count, [video['video_id'] for video in videos])
     return videos
 
-def calculate_metrics(videos, followers_count):
-    """Berechnet die Metriken avg_likes, avg_comments, total_likes, total_comments, engagement_rate."""
-    total_likes = sum(video['like_count'] for video in videos)
-    total_comments = sum(video['comment_count'] for video in videos)
-    avg_likes = total_likes // len(videos) if videos else 0
-    avg_comments = total_comments // len(videos) if videos else 0
-    engagement_rate = (total_likes + total_comments) / followers_count * 100 if followers_count > 0 else 0
-    return avg_likes, avg_comments, total_likes, total_comments, engagement_rate
+def save_tiktok_profile(cursor, profile_data, avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag):
+    """Speichert das Profil und einen neuen Eintrag in der Profil-Historie."""
+    cursor.execute("""
+        INSERT INTO tiktok_profiles (user_id, nickname, follower_count, video_count)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            nickname = VALUES(nickname),
+            follower_count = VALUES(follower_count),
+            video_count = VALUES(video_count)
+    """, (
+        profile_data['user_id'],
+        profile_data['nickname'],
+        profile_data['follower_count'],
+        profile_data['video_count']
+    ))
+
+    # Unveränderte Profile bekommen keinen neuen Historien-Eintrag
+    if not profile_changes.changed(profile_data['user_id'], profile_data['follower_count'],
+                                   profile_data['video_count'], total_likes, total_comments):
+        return
+    cursor.execute("""
+        INSERT INTO tiktok_profile_history (user_id, follower_count, video_count, avg_likes, avg_comments,
+                                            engagement_rate, growth_rate, total_likes, total_comments, bot_flag)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, (
+        profile_data['user_id'],
+        profile_data['follower_count'],
+        profile_data['video_count'],
+        avg_likes,
+        avg_comments,
+        engagement_rate,
+        growth_rate,
+        total_likes,
+        total_comments,
+        bot_flag
+    ))
+
+# Video-Zeilen werden gebündelt geschrieben; tiktok_videos muss vor der Historie geschrieben werden
+VIDEO_STATEMENTS = {
+    "tiktok_videos": """
+        INSERT INTO tiktok_videos (video_id, user_id, description, create_time, view_count, like_count, comment_count)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            view_count = VALUES(view_count),
+            like_count = VALUES(like_count),
+            comment_count = VALUES(comment_count)
+    """,
+    "tiktok_video_history": """
+        INSERT INTO tiktok_video_history (video_id, view_count, like_count, comment_count)
+        VALUES (%s, %s, %s, %s)
+    """,
+}
 
-async def monitor_and_update_tiktok_data():
-    db_connection = get_db_connection()
-    cursor = db_connection.cursor()
+def save_tiktok_videos(writer, user_id, video_data):
+    """Reiht die Videos und ihre Historien-Einträge im Batch-Writer ein."""
+    for video in video_data:
+        writer.add("tiktok_videos", (
+            video['video_id'],
+            user_id,
+            video['description'],
+            video['create_time'],
+            video['view_count'],
+            video['like_count'],
+            video['comment_count']
+        ))
+        if video_changes.changed(video['video_id'], video['view_count'], video['like_count'], video['comment_count']):
+            writer.add("tiktok_video_history", (
+                video['video_id'],
+                video['view_count'],
+                video['like_count'],
+                video['comment_count']
+            ))
+
+def update_tiktok_data(cursor, writer, influencer_id, profile_data, video_data):
+    """Berechnet die Metriken eines Profils, speichert Profil- und Videodaten und liefert den neuen Snapshot."""
+    username = profile_data['username']
+    # Metriken nur über die neuesten Videos, unabhängig davon, wie viele dieser Abruf gelesen hat
+    recent_videos = newest(video_data, 'create_time', media_cursors.window)
+    with instrumentation.stage('tiktok', 'metrics', username):
+        avg_likes, avg_comments, total_likes, total_comments, engagement_rate = calculate_metrics(
+            recent_videos, profile_data['follower_count']
+        )
+
+    # Letzter Stand aus der Snapshot-Tabelle statt einer sortierten Abfrage auf die Historie
+    with instrumentation.stage('tiktok', 'db_read', username):
+        previous = get_snapshot(cursor, 'tiktok', profile_data['user_id'])
+    growth_rate = compute_growth_rate(previous, profile_data["follower_count"])
+
+    with instrumentation.stage('tiktok', 'bot_detection', username):
+        bot_flag = bot_detector.detect_snapshot(previous, profile_data['follower_count'], total_likes, total_comments)
+
+    with instrumentation.stage('tiktok', 'db_write', username):
+        save_tiktok_profile(cursor, profile_data, avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag)
+        snapshot = record_snapshot(cursor, 'tiktok', profile_data['user_id'], previous, influencer_id,
+                                   profile_data['follower_count'], total_likes, total_comments, engagement_rate,
+                                   growth_rate, bot_flag, posts_per_day(video['create_time'] for video in recent_videos))
+        save_tiktok_videos(writer, profile_data['user_id'], video_data)
+    return snapshot
+
+def save_spooled(cursor, writer, influencer_id, tiktok_username, payload):
+    """Speichert ein (profile_data, video_data)-Paar aus dem Spool."""
+    return update_tiktok_data(cursor, writer, influencer_id, *payload)
+
+def save_influencer(pool, writer, spool, influencer_id, tiktok_username, payload):
+    """Legt ein Influencer-Ergebnis im Spool ab und schreibt es in einer eigenen Transaktion (läuft im DB-Thread).
+
+    Liefert den Snapshot oder None, wenn das Schreiben fehlschlug; die Daten werden dann später aus dem Spool nachgeholt.
+    """
+    return spool.save(pool, writer, save_spooled, influencer_id, tiktok_username, payload)
+
+def load_due(pool, scheduler):
+    with pool.cursor() as cursor:
+        scheduler.load(cursor)
+
+async def fetch_influencer(api, sessions, tiktok_username):
+    """Holt Profil und Videos eines Influencers; bei Rate-Limits über eine andere Session erneut."""
+    for attempt in range(TIKTOK_MAX_ATTEMPTS):
+        if attempt:
+            instrumentation.count('retries', 'tiktok')
+        session_index = await sessions.acquire()
+        try:
+            with instrumentation.stage('tiktok', 'fetch', tiktok_username):
+                profile_data = await fetch_tiktok_profile(api, tiktok_username, session_index)
+                video_data = await fetch_tiktok_videos(api, profile_data['user_id'], profile_data['video_count'],
+                                                        session_index=session_index, sec_uid=profile_data['sec_uid'])
+        except RATE_LIMIT_ERRORS:
+            instrumentation.count('errors', 'tiktok')
+            sessions.rate_limited(session_index)
+            continue
+        sessions.succeeded(session_index)
+        return profile_data, video_data
+    print(f"Giving up on TikTok user {tiktok_username} after {TIKTOK_MAX_ATTEMPTS} attempts")
+    return None
+
+async def process_influencer(api, sessions, semaphore, run_db, influencer_id, tiktok_username):
+    """Holt Profil und Videos eines Influencers, übergibt sie an den DB-Thread und liefert (abgerufen, Snapshot)."""
+    async with semaphore:
+        result = await fetch_influencer(api, sessions, tiktok_username)
+    if result is None:
+        return False, None
+
+    return True, await run_db(influencer_id, tiktok_username, result)
+
+async def monitor_and_update_tiktok_data(max_cycles=None):
+    """Aktualisiert fällige Influencer endlos oder für max_cycles Zyklen (für den Benchmark)."""
+    pool = get_pool()
+    loop = asyncio.get_running_loop()
+    # Ein einzelner Thread für alle DB-Zugriffe: blockiert die Event-Loop nicht und hält den Writer seriell
+    db_executor = ThreadPoolExecutor(max_workers=1)
 
     async with TikTokApi() as api:
-        await api.create_sessions(ms_tokens=[ms_token], num_sessions=1, sleep_after=3)
+        await api.create_sessions(ms_tokens=ms_tokens, num_sessions=len(ms_tokens), sleep_after=3)
+
+        # Abgerufene Daten überstehen Abstürze und fehlgeschlagene Schreibvorgänge und werden nachgeholt statt neu abgerufen
+        spool = Spool('tiktok')
+        writer = BatchWriter(pool, VIDEO_STATEMENTS, platform='tiktok', on_flush=spool.ack_saved)
+        scheduler = DueScheduler(['tiktok'])
+        start_exporter('tiktok')
+        sessions = SessionScheduler(len(ms_tokens))
+        semaphore = asyncio.Semaphore(TIKTOK_CONCURRENCY)
+        cycles = 0
+
+        def run_db(influencer_id, tiktok_username, payload):
+            return loop.run_in_executor(db_executor, save_influencer, pool, writer, spool, influencer_id, tiktok_username, payload)
 
         while True:
-            cursor.execute("SELECT influencer_id, TikTok_Username FROM influencers WHERE TikTok_Username IS NOT NULL")
-            influencers = cursor.fetchall()
-
-            for influencer in influencers:
-                influencer_id, tiktok_username = influencer
-
-                cursor.execute("""
-                    SELECT last_updated FROM tiktok_profile_history 
-                    WHERE user_id = %s 
-                    ORDER BY last_updated DESC 
-                    LIMIT 1
-                """, (tiktok_username,))
-                last_update = cursor.fetchone()
-
-                if not last_update or (datetime.now() - last_update[0]) >= timedelta(hours=24):
-                    profile_data = await fetch_tiktok_profile(api, tiktok_username)
-                    video_data = await fetch_tiktok_videos(api, profile_data['user_id'])
-                    avg_likes, avg_comments, total_likes, total_comments, engagement_rate = calculate_metrics(
-                        video_data, profile_data['follower_count']
-                    )
-
-                    cursor.execute("SELECT follower_count FROM tiktok_profile_history WHERE user_id = %s ORDER BY last_updated DESC LIMIT 1", (profile_data['user_id'],))
-                    previous_data = cursor.fetchone()
-                    previous_followers_count = previous_data[0] if previous_data else 0
-                    growth_rate = ((profile_data["follower_count"] - previous_followers_count) / previous_followers_count * 100
-                                   if previous_followers_count > 0 else 0)
-
-                    bot_flag = False  # Hier könnte eine Bot-Erkennungslogik eingefügt werden
-
-                    save_tiktok_profile(cursor, profile_data, avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag)
-                    save_tiktok_videos(cursor, video_data)
-
-            db_connection.commit()
-            await asyncio.sleep(3600)  # Stündliche Überprüfung
-
-    cursor.close()
-    db_connection.close()
+            # Was der letzte Lauf oder Zyklus abgerufen, aber nicht gespeichert hat, vor dem Laden der fälligen Influencer schreiben
+            await loop.run_in_executor(db_executor, spool.replay, pool, writer, save_spooled)
+            # Fällige Influencer mit einer einzigen Abfrage laden statt einer Abfrage pro Influencer
+            if scheduler.needs_reload():
+                await loop.run_in_executor(db_executor, load_due, pool, scheduler)
+
+            due = scheduler.pop_due()
+            started = time.monotonic()
+            instrumentation.start_cycle('tiktok')
+            results = await asyncio.gather(
+                *(process_influencer(api, sessions, semaphore, run_db, influencer_id, tiktok_username)
+                  for _, influencer_id, tiktok_username in due),
+                return_exceptions=True
+            )
+            for (platform, influencer_id, tiktok_username), result in zip(due, results):
+                if isinstance(result, Exception):
+                    print(f"Error updating TikTok user {tiktok_username}: {result}")
+                    instrumentation.count('errors', 'tiktok')
+                    result = (False, None)
+                fetched, snapshot = result
+                # Nächster Abruf nach dem adaptiven Intervall des Accounts, bei Abruffehlern nach RETRY_INTERVAL;
+                # gespoolte Daten, die nicht geschrieben werden konnten, werden nachgeholt statt neu abgerufen
+                scheduler.reschedule(platform, influencer_id, tiktok_username, fetched,
+                                     snapshot and snapshot['refresh_interval'])
+
+            try:
+                await loop.run_in_executor(db_executor, writer.flush)
+                await loop.run_in_executor(db_executor, refresh_rankings_if_due, pool)
+            except Exception as e:
+                # Gepufferte Zeilen werden beim nächsten Flush erneut geschrieben, ihre Daten bleiben bis dahin im Spool
+                print(f"End-of-cycle write failed, retrying next cycle: {e}")
+                instrumentation.count('errors', 'tiktok')
+            if due:
+                print(f"Updated {len(due)} TikTok users in {time.monotonic() - started:.1f}s "
+                      f"with {len(ms_tokens)} sessions")
+            print(f"Video writes: {writer.report()}")
+            print(f"History: {profile_changes.report()}, {video_changes.report()}")
+            print(f"Video refreshes: {media_cursors.report()}")
+            instrumentation.end_cycle('tiktok')
+            cycles += 1
+            if max_cycles and cycles >= max_cycles:
+                break
+            await asyncio.sleep(scheduler.seconds_until_next())  # Schlafen bis der nächste Influencer fällig ist
 
 # Startet die asynchrone Überwachungsfunktion
 if __name__ == "__main__":
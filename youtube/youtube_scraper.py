@@ -1,76 +1,322 @@
 import sys
 import os
 import time
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime
+
+_import_started = time.perf_counter()
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import shelve
-from googleapiclient.discovery import build
-from common.db import get_db_connection
-from common.config import YOUTUBE_API_KEY
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from common.db import get_pool
+from common.scheduler import DueScheduler
+from common.batch_writer import BatchWriter
+from common.cache import Cache
+from common.bot_detection import BotDetector
+from common.metrics import calculate_metrics
+from common.snapshots import get_snapshot, compute_growth_rate, record_snapshot
+from common.instrumentation import get_instrumentation, start_exporter
+from common.change_detection import ChangeDetector
+from common.refresh_policy import posts_per_day
+from common.impact_score import refresh_rankings_if_due
+from common.spool import Spool
+from common.media_cursors import MediaCursors, STATS, newest
+from common.config import (
+    YOUTUBE_API_KEY,
+    YOUTUBE_FETCH_MODE,
+    YOUTUBE_DAILY_QUOTA,
+    YOUTUBE_DISCOVERY_FILE,
+    YOUTUBE_CACHE_FILE,
+    CACHE_MAX_ENTRIES,
+)
+
+cache = Cache(YOUTUBE_CACHE_FILE)
+bot_detector = BotDetector('youtube')
+# Verfolgte Videos pro Kanal; neue Uploads werden nur bis zum neuesten bekannten Video gesucht
+media_cursors = MediaCursors('youtube')
+instrumentation = get_instrumentation()
+
+# Historien-Einträge werden nur geschrieben, wenn sich die Zähler seit dem letzten Abruf geändert haben
+channel_changes = ChangeDetector('youtube', 'channel')
+video_changes = ChangeDetector('youtube', 'video')
+
+# Ein gemeinsamer Client für alle Threads (der Benchmark setzt hier einen Fake ein); sonst einer pro Thread
+youtube = None
+_local = threading.local()
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+# Startzeiten in Sekunden: Import des Moduls, Laden des Discovery-Dokuments, Bau des ersten Clients, erster Request
+startup_timings = {'import': None, 'discovery': None, 'build': None, 'first_request': None}
+
+def record_startup(stage, seconds):
+    if startup_timings[stage] is None:
+        startup_timings[stage] = seconds
+        instrumentation.observe('startup_seconds', 'youtube', stage, seconds)
+
+def load_discovery_document():
+    """Liefert das Discovery-Dokument der YouTube Data API v3, einmal pro Prozess und ohne Netzwerkzugriff."""
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            started = time.perf_counter()
+            if YOUTUBE_DISCOVERY_FILE:
+                with open(YOUTUBE_DISCOVERY_FILE, encoding='utf-8') as f:
+                    _discovery_document = f.read()
+            else:
+                _discovery_document = get_static_doc('youtube', 'v3')
+                if _discovery_document is None:
+                    raise RuntimeError("google-api-python-client has no bundled youtube v3 discovery document, "
+                                       "set YOUTUBE_DISCOVERY_FILE")
+            record_startup('discovery', time.perf_counter() - started)
+        return _discovery_document
+
+def get_youtube():
+    """Liefert den YouTube-Client des aufrufenden Threads und baut ihn beim ersten Aufruf.
+
+    Die httplib2-Verbindung eines Clients ist nicht thread-sicher, deshalb bekommt
+    jeder Thread einen eigenen; das Discovery-Dokument wird nur einmal gelesen.
+    """
+    if youtube is not None:
+        return youtube
+    client = getattr(_local, 'client', None)
+    if client is None:
+        document = load_discovery_document()
+        started = time.perf_counter()
+        client = _local.client = build_from_document(document, developerKey=YOUTUBE_API_KEY)
+        record_startup('build', time.perf_counter() - started)
+    return client
+
+def startup_report():
+    """Einzeilige Zusammenfassung der Startzeiten."""
+    return ", ".join(f"{stage} {seconds * 1000:.1f} ms" if seconds is not None else f"{stage} -"
+                     for stage, seconds in startup_timings.items())
+
+# Quota-Kosten pro API-Aufruf laut YouTube Data API
+QUOTA_COSTS = {
+    'channels.list': 1,
+    'playlistItems.list': 1,
+    'search.list': 100,
+    'videos.list': 1,
+}
+
+# ETags und Antworten werden länger gehalten als die Kanaldaten, damit Revalidierungen greifen
+ETAG_TTL = 30 * 24 * 3600
+
+# ETag-Einträge pro Kanal: Upload-Seiten und videos.list-Batches, mit Reserve
+ETAG_KEYS_PER_CHANNEL = 4
+
+def size_cache(channels):
+    """Richtet die LRU-Größe des Caches nach der Zahl der verfolgten Kanäle, damit keine ETags verdrängt werden."""
+    cache.max_entries = max(CACHE_MAX_ENTRIES, channels * ETAG_KEYS_PER_CHANNEL)
+
+
+class QuotaTracker:
+    """Zählt den Quota-Verbrauch pro Zyklus, um die Kanäle pro API-Key abzuschätzen."""
 
-CACHE_FILE = 'youtube_cache'
-youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+    def __init__(self, daily_quota=YOUTUBE_DAILY_QUOTA):
+        self.daily_quota = daily_quota
+        self.reset()
 
-def fetch_youtube_data(channel_id, cache_duration=timedelta(days=3)):
-    """Fetch and cache YouTube channel and video data."""
-    with shelve.open(CACHE_FILE) as cache:
-        if channel_id in cache:
-            cached_data, last_update = cache[channel_id]
-            if datetime.now() - last_update < cache_duration:
-                return cached_data  # Return cached data if within cache duration
+    def reset(self):
+        self.units = 0
+        self.calls = {}
+        self.not_modified = 0
+        self.channels = 0
 
-        channel_request = youtube.channels().list(
+    def spend(self, method):
+        self.units += QUOTA_COSTS[method]
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    def report(self):
+        units_per_channel = self.units / self.channels if self.channels else 0
+        capacity = int(self.daily_quota / units_per_channel) if units_per_channel else 0
+        calls = ", ".join(f"{method}={count}" for method, count in sorted(self.calls.items()))
+        return (f"{self.units} units for {self.channels} channels ({units_per_channel:.1f} units/channel, "
+                f"~{capacity} channels/day per key), {self.not_modified} not modified [{calls}]")
+
+
+quota = QuotaTracker()
+
+def execute_request(request, method, etag_key=None):
+    """Führt einen API-Request aus; mit etag_key als bedingten Request (If-None-Match).
+
+    Bei 304 Not Modified wird die zuletzt gespeicherte Antwort zurückgegeben.
+    """
+    stored = cache.get(etag_key) if etag_key else None
+    if stored:
+        request.headers['If-None-Match'] = stored['etag']
+    quota.spend(method)
+    instrumentation.count('api_calls', 'youtube')
+    started = time.perf_counter()
+    try:
+        response = request.execute()
+    except HttpError as e:
+        record_startup('first_request', time.perf_counter() - started)
+        if stored and e.resp.status == 304:
+            quota.not_modified += 1
+            instrumentation.count('not_modified', 'youtube')
+            return stored['response']
+        raise  # Fehler zählt der Aufrufer, der ihn behandelt
+    record_startup('first_request', time.perf_counter() - started)
+    if etag_key and 'etag' in response:
+        cache.set(etag_key, {'etag': response['etag'], 'response': response}, ttl=ETAG_TTL)
+    return response
+
+# Maximale Anzahl IDs pro channels().list / videos().list Aufruf
+MAX_IDS_PER_CALL = 50
+
+def fetch_youtube_data(channel_id):
+    """Fetch YouTube channel and video data."""
+    return fetch_youtube_data_batch([channel_id])[channel_id]
+
+def fetch_youtube_data_batch(channel_ids):
+    """Fetch channel and video data for several channels.
+
+    Channel statistics are fetched together in chunks of 50 IDs. Every call
+    goes to the API (the refresh interval decides how often a channel is
+    fetched); unchanged responses are answered cheaply through their ETags.
+    Returns {channel_id: (profile_data, post_data)}, with (None, None) for
+    channels the API did not return, whose chunk failed or whose videos
+    could not be fetched.
+    """
+    results = {}
+    channel_ids = list(channel_ids)
+    profiles = {}
+    for i in range(0, len(channel_ids), MAX_IDS_PER_CALL):
+        chunk = channel_ids[i:i + MAX_IDS_PER_CALL]
+        try:
+            with instrumentation.stage('youtube', 'fetch_channels'):
+                profiles.update(fetch_channel_statistics(chunk))
+        except Exception as e:
+            # Ein fehlgeschlagener channels.list-Aufruf (5xx, quotaExceeded) betrifft nur die Kanäle dieses Chunks
+            print(f"Error fetching statistics of {len(chunk)} YouTube channels: {e}")
+            instrumentation.count('errors', 'youtube')
+            for channel_id in chunk:
+                results[channel_id] = (None, None)
+    for channel_id in channel_ids:
+        if channel_id in results:
+            continue
+        profile_data = profiles.get(channel_id)
+        if profile_data is None:
+            print(f"YouTube channel {channel_id} not found")
+            results[channel_id] = (None, None)
+            continue
+
+        quota.channels += 1
+        try:
+            with instrumentation.stage('youtube', 'fetch', channel_id):
+                video_ids = fetch_videos(channel_id, profile_data['video_count'])
+                post_data = fetch_video_details(video_ids, channel_id)  # channel_id übergeben
+        except Exception as e:
+            # Ein fehlerhafter Kanal verwirft nicht die bereits geholten Kanäle des Batches
+            print(f"Error fetching videos of YouTube channel {channel_id}: {e}")
+            instrumentation.count('errors', 'youtube')
+            results[channel_id] = (None, None)
+            continue
+        results[channel_id] = (profile_data, post_data)
+    return results
+
+def fetch_channel_statistics(channel_ids):
+    """Fetch snippet and statistics for many channels, 50 IDs per request."""
+    profiles = {}
+    for i in range(0, len(channel_ids), MAX_IDS_PER_CALL):
+        batch = channel_ids[i:i + MAX_IDS_PER_CALL]
+        channel_request = get_youtube().channels().list(
             part='snippet,statistics',
-            id=channel_id
+            id=','.join(batch),
+            maxResults=MAX_IDS_PER_CALL
         )
-        channel_response = channel_request.execute()
-        item = channel_response['items'][0]
-        
-        profile_data = {
-            "channel_id": item['id'],
-            "channel_name": item['snippet']['title'],
-            "subscribers_count": int(item['statistics'].get('subscriberCount', 0)),
-            "view_count": int(item['statistics'].get('viewCount', 0)),
-            "video_count": int(item['statistics'].get('videoCount', 0)),
-        }
-
-        video_ids = fetch_videos(channel_id)
-        post_data = fetch_video_details(video_ids, channel_id)  # channel_id übergeben
-        cache[channel_id] = ((profile_data, post_data), datetime.now())  # Update cache
-        return profile_data, post_data
-
-
-def fetch_videos(channel_id):
+        # Ohne ETag: die Zusammensetzung fälliger Kanäle wiederholt sich kaum, 304-Antworten wären selten
+        channel_response = execute_request(channel_request, 'channels.list')
+        for item in channel_response.get('items', []):
+            profiles[item['id']] = {
+                "channel_id": item['id'],
+                "channel_name": item['snippet']['title'],
+                "subscribers_count": int(item['statistics'].get('subscriberCount', 0)),
+                "view_count": int(item['statistics'].get('viewCount', 0)),
+                "video_count": int(item['statistics'].get('videoCount', 0)),
+            }
+    return profiles
+
+
+def fetch_videos(channel_id, video_count=None):
+    """Liefert die IDs der verfolgten Videos eines Kanals (neueste zuerst).
+
+    Neue Uploads werden je nach YOUTUBE_FETCH_MODE nur bis zum neuesten bereits
+    verfolgten Video gesucht. Ist die Videoanzahl des Kanals unverändert, entfällt
+    die Suche; die Statistiken aller verfolgten Videos kosten dann nur videos.list.
+    """
+    state = media_cursors.get(channel_id)
+    plan = media_cursors.plan(state, video_count)
+    new_ids = []
+    if plan != STATS:
+        list_page = fetch_upload_ids if YOUTUBE_FETCH_MODE == 'playlist' else search_video_ids
+        tracked = set(state['tracked'])
+        page_token = None
+        while True:
+            video_ids, page_token = list_page(channel_id, page_token)
+            new_ids.extend(video_ids)
+            reached_known = any(video_id in tracked for video_id in new_ids)
+            if not video_ids or not page_token or media_cursors.enough(plan, len(new_ids), reached_known):
+                break
+    return media_cursors.update(channel_id, state, plan, video_count, new_ids)
+
+def search_video_ids(channel_id, page_token=None):
+    """Eine Seite der neuesten Videos über die Suche; liefert (IDs, nächstes Seiten-Token)."""
     video_ids = []
-    request = youtube.search().list(
+    request = get_youtube().search().list(
         part='id',
         channelId=channel_id,
-        maxResults=10,
-        order='date'
+        maxResults=MAX_IDS_PER_CALL,
+        order='date',
+        pageToken=page_token
     )
-    response = request.execute()
+    response = execute_request(request, 'search.list')
     for item in response['items']:
         if item['id']['kind'] == 'youtube#video':
             video_ids.append(item['id']['videoId'])
-    return video_ids
+    return video_ids, response.get('nextPageToken')
+
+def fetch_upload_ids(channel_id, page_token=None):
+    """Liest eine Seite der Uploads-Playlist des Kanals (1 statt 100 Quota-Einheiten); liefert (IDs, nächstes Seiten-Token)."""
+    # Die Uploads-Playlist eines Kanals "UC..." hat die ID "UU..."
+    playlist_id = 'UU' + channel_id[2:]
+    request = get_youtube().playlistItems().list(
+        part='contentDetails',
+        playlistId=playlist_id,
+        maxResults=MAX_IDS_PER_CALL,
+        pageToken=page_token
+    )
+    etag_key = f"etag:uploads:{channel_id}:{page_token}" if page_token else f"etag:uploads:{channel_id}"
+    try:
+        response = execute_request(request, 'playlistItems.list', etag_key)
+    except HttpError as e:
+        if e.resp.status == 404:
+            return [], None  # Kanal ohne Uploads
+        raise
+    return [item['contentDetails']['videoId'] for item in response['items']], response.get('nextPageToken')
 
 def fetch_video_details(video_ids, channel_id):
     """Fetch detailed information for each video ID."""
     video_details = []
-    for i in range(0, len(video_ids), 50):
-        request = youtube.videos().list(
+    for i in range(0, len(video_ids), MAX_IDS_PER_CALL):
+        batch = video_ids[i:i + MAX_IDS_PER_CALL]
+        request = get_youtube().videos().list(
             part='snippet,statistics',
-            id=','.join(video_ids[i:i + 50])
+            id=','.join(batch)
         )
-        response = request.execute()
+        response = execute_request(request, 'videos.list', f"etag:videos:{','.join(batch)}")
         for item in response['items']:
             video_details.append({
                 "video_id": item['id'],
                 "channel_id": channel_id,  # Hinzufügen von channel_id zu jedem Video-Eintrag
                 "title": item['snippet']['title'],
+                "published_at": parse_published_at(item['snippet'].get('publishedAt')),
                 "view_count": int(item['statistics'].get('viewCount', 0)),
                 "like_count": int(item['statistics'].get('likeCount', 0)),
                 "comment_count": int(item['statistics'].get('commentCount', 0)),
@@ -78,14 +324,12 @@ def fetch_video_details(video_ids, channel_id):
     return video_details
 
 
-def calculate_metrics(post_data, subscribers_count):
-    """Calculate metrics like avg_likes, avg_comments, total_likes, total_comments, engagement_rate."""
-    total_likes = sum(post['like_count'] for post in post_data)
-    total_comments = sum(post['comment_count'] for post in post_data)
-    avg_likes = total_likes // len(post_data) if post_data else 0
-    avg_comments = total_comments // len(post_data) if post_data else 0
-    engagement_rate = (total_likes + total_comments) / subscribers_count * 100 if subscribers_count > 0 else 0
-    return avg_likes, avg_comments, total_likes, total_comments, engagement_rate
+def parse_published_at(value):
+    """Wandelt publishedAt (ISO 8601, UTC) in ein datetime um."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
 
 def save_channel_data(cursor, channel_data, avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag):
     cursor.execute("""
@@ -104,6 +348,11 @@ def save_channel_data(cursor, channel_data, avg_likes, avg_comments, engagement_
         channel_data['video_count']
     ))
 
+    # Unveränderte Kanäle bekommen keinen neuen Historien-Eintrag
+    if not channel_changes.changed(channel_data['channel_id'], channel_data['subscribers_count'],
+                                   channel_data['view_count'], channel_data['video_count'],
+                                   total_likes, total_comments):
+        return
     cursor.execute("""
         INSERT INTO youtube_channel_history (channel_id, subscriber_count, view_count, video_count, avg_likes, avg_comments, 
                                              engagement_rate, growth_rate, total_likes, total_comments, bot_flag)
@@ -122,8 +371,9 @@ def save_channel_data(cursor, channel_data, avg_likes, avg_comments, engagement_
         bot_flag
     ))
 
-def save_video_data(cursor, video_data):
-    cursor.execute("""
+# Video rows are written in batches; youtube_videos must be flushed before its history
+VIDEO_STATEMENTS = {
+    "youtube_videos": """
         INSERT INTO youtube_videos (video_id, channel_id, title, view_count, like_count, comment_count)
         VALUES (%s, %s, %s, %s, %s, %s)
         ON DUPLICATE KEY UPDATE
@@ -131,7 +381,15 @@ def save_video_data(cursor, video_data):
             like_count = VALUES(like_count),
             comment_count = VALUES(comment_count),
             last_updated = CURRENT_TIMESTAMP
-    """, (
+    """,
+    "youtube_video_history": """
+        INSERT INTO youtube_video_history (video_id, view_count, like_count, comment_count)
+        VALUES (%s, %s, %s, %s)
+    """,
+}
+
+def save_video_data(writer, video_data):
+    writer.add("youtube_videos", (
         video_data['video_id'],
         video_data['channel_id'],
         video_data['title'],
@@ -140,111 +398,120 @@ def save_video_data(cursor, video_data):
         video_data['comment_count']
     ))
 
-    cursor.execute("""
-        INSERT INTO youtube_video_history (video_id, view_count, like_count, comment_count)
-        VALUES (%s, %s, %s, %s)
-    """, (
-        video_data['video_id'],
-        video_data['view_count'],
-        video_data['like_count'],
-        video_data['comment_count']
-    ))
+    if video_changes.changed(video_data['video_id'], video_data['view_count'],
+                             video_data['like_count'], video_data['comment_count']):
+        writer.add("youtube_video_history", (
+            video_data['video_id'],
+            video_data['view_count'],
+            video_data['like_count'],
+            video_data['comment_count']
+        ))
 
-def detect_bot_activity(cursor, channel_id, current_subscribers_count, total_views, total_likes, total_comments):
-    """Detect bot activity based on unusual spikes in subscribers, views, likes, and comments."""
-    follower_spike = detect_follower_spike(cursor, channel_id, current_subscribers_count)
-    engagement_spike = detect_engagement_spike(cursor, channel_id, total_likes, total_comments, total_views)
-    return follower_spike or engagement_spike
+def detect_bot_activity(previous, current_subscribers_count, total_likes, total_comments):
+    """Erkennt ungewöhnliche Sprünge bei Abonnenten und Engagement über rollierende Statistiken."""
+    return bot_detector.detect_snapshot(previous, current_subscribers_count, total_likes, total_comments)
 
-def detect_follower_spike(cursor, channel_id, current_subscribers_count):
-    """Erkennt einen plötzlichen Anstieg der Abonnentenzahl im Vergleich zu historischen Daten."""
-    # Holen Sie die letzten 5 Abonnentenzahlen aus der Historientabelle
-    cursor.execute("""
-        SELECT subscriber_count FROM youtube_channel_history 
-        WHERE channel_id = %s ORDER BY last_updated DESC LIMIT 5
-    """, (channel_id,))
-    history = cursor.fetchall()
-    
-    # Wenn es weniger als 2 Datenpunkte gibt, ist keine Erkennung möglich
-    if len(history) < 2:
-        return False  # Nicht genügend Daten für die Spike-Erkennung
-
-    # Berechnen Sie den durchschnittlichen Abonnentenzuwachs der letzten Datenpunkte
-    avg_subscribers = sum(row[0] for row in history[1:]) / (len(history) - 1)
-    
-    # Überprüfen Sie, ob die aktuelle Abonnentenzahl 50% über dem Durchschnitt liegt
-    return current_subscribers_count > avg_subscribers * 1.5  # Spike-Erkennung bei 50% Anstieg
-
-def detect_engagement_spike(cursor, channel_id, total_likes, total_comments, total_views):
-    """Erkennt plötzliche Engagement-Spikes bei Likes, Kommentaren und Views im Vergleich zu historischen Daten."""
-    cursor.execute("""
-        SELECT total_likes, total_comments, view_count FROM youtube_channel_history
-        WHERE channel_id = %s ORDER BY last_updated DESC LIMIT 10
-    """, (channel_id,))
-    history = cursor.fetchall()
-    
-    # Wenn es weniger als 2 Datenpunkte gibt, ist keine Erkennung möglich
-    if len(history) < 2:
-        return False  # Nicht genügend Daten für die Spike-Erkennung
-
-    # Überprüfen der letzten Werte auf Spikes im Vergleich zu früheren Daten
-    for i in range(1, len(history)):
-        like_diff = history[i-1][0] - history[i][0]
-        comment_diff = history[i-1][1] - history[i][1]
-        view_diff = history[i-1][2] - history[i][2]
-        
-        # Definieren Sie die Spike-Schwellenwerte für einen Anstieg in kurzer Zeit
-        if like_diff > 100 or comment_diff > 50 or view_diff > 1000:
-            return True  # Spike erkannt
-    return False
-
-
-def monitor_and_update_data():
-    db_connection = get_db_connection()
-    cursor = db_connection.cursor()
+
+def update_channel_data(cursor, writer, influencer_id, channel_id, channel_data, post_data):
+    """Berechnet die Metriken eines Kanals, speichert Kanal- und Videodaten und liefert den neuen Snapshot."""
+    # Metriken nur über die neuesten Videos, nicht über alle verfolgten
+    recent_videos = newest(post_data, 'published_at', media_cursors.window)
+    with instrumentation.stage('youtube', 'metrics', channel_id):
+        avg_likes, avg_comments, total_likes, total_comments, engagement_rate = calculate_metrics(
+            recent_videos, channel_data['subscribers_count']
+        )
+
+    # Letzter Stand aus der Snapshot-Tabelle statt einer sortierten Abfrage auf die Historie
+    with instrumentation.stage('youtube', 'db_read', channel_id):
+        previous = get_snapshot(cursor, 'youtube', channel_id)
+    growth_rate = compute_growth_rate(previous, channel_data["subscribers_count"])
+
+    with instrumentation.stage('youtube', 'bot_detection', channel_id):
+        bot_flag = detect_bot_activity(previous, channel_data['subscribers_count'], total_likes, total_comments)
+
+    with instrumentation.stage('youtube', 'db_write', channel_id):
+        save_channel_data(cursor, channel_data, avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag)
+        snapshot = record_snapshot(cursor, 'youtube', channel_id, previous, influencer_id,
+                                   channel_data['subscribers_count'], total_likes, total_comments, engagement_rate,
+                                   growth_rate, bot_flag, posts_per_day(video.get('published_at') for video in recent_videos))
+
+        for video in post_data:
+            save_video_data(writer, video)
+    return snapshot
+
+def save_spooled(cursor, writer, influencer_id, channel_id, payload):
+    """Speichert ein (channel_data, post_data)-Paar aus dem Spool."""
+    return update_channel_data(cursor, writer, influencer_id, channel_id, *payload)
+
+def monitor_and_update_data(max_cycles=None):
+    """Aktualisiert fällige Kanäle endlos oder für max_cycles Zyklen (für den Benchmark)."""
+    pool = get_pool()
+    # Abgerufene Daten überstehen Abstürze und fehlgeschlagene Schreibvorgänge und werden nachgeholt statt neu abgerufen
+    spool = Spool('youtube')
+    writer = BatchWriter(pool, VIDEO_STATEMENTS, platform='youtube', on_flush=spool.ack_saved)
+    scheduler = DueScheduler(['youtube'])
+    start_exporter('youtube')
+    cycles = 0
 
     while True:
-        # Hole alle YouTube-Kanäle aus der `influencers`-Tabelle
-        cursor.execute("SELECT influencer_id, YouTube_ChannelID FROM influencers WHERE YouTube_ChannelID IS NOT NULL")
-        influencers = cursor.fetchall()
-
-        for influencer in influencers:
-            influencer_id, channel_id = influencer
-
-            # Überprüfen, wann zuletzt aktualisiert wurde
-            cursor.execute("""
-                SELECT last_updated FROM youtube_channel_history 
-                WHERE channel_id = %s 
-                ORDER BY last_updated DESC 
-                LIMIT 1
-            """, (channel_id,))
-            last_update = cursor.fetchone()
-
-            if not last_update or (datetime.now() - last_update[0]) >= timedelta(hours=24):
-                channel_data, post_data = fetch_youtube_data(channel_id)
+        # Was der letzte Lauf oder Zyklus abgerufen, aber nicht gespeichert hat, vor dem Laden der fälligen Kanäle schreiben
+        spool.replay(pool, writer, save_spooled)
+        # Fällige Kanäle mit einer einzigen Abfrage laden statt einer Abfrage pro Kanal
+        if scheduler.needs_reload():
+            with pool.cursor() as cursor:
+                scheduler.load(cursor)
+            size_cache(scheduler.tracked('youtube'))
+
+        due = scheduler.pop_due()
+        instrumentation.start_cycle('youtube')
+        # Kanalstatistiken für jeweils 50 fällige Kanäle mit einem Aufruf laden
+        for i in range(0, len(due), MAX_IDS_PER_CALL):
+            batch = due[i:i + MAX_IDS_PER_CALL]
+            try:
+                results = fetch_youtube_data_batch([channel_id for _, _, channel_id in batch])
+            except Exception as e:
+                # Bereits als fällig entnommene Kanäle dürfen nicht verloren gehen: als fehlgeschlagen neu einplanen
+                print(f"Error fetching YouTube batch: {e}")
+                instrumentation.count('errors', 'youtube')
+                results = {}
+            for platform, influencer_id, channel_id in batch:
+                channel_data, post_data = results.get(channel_id, (None, None))
                 if channel_data:
-                    avg_likes, avg_comments, total_likes, total_comments, engagement_rate = calculate_metrics(
-                        post_data, channel_data['subscribers_count']
-                    )
-                    
-                    cursor.execute("SELECT subscriber_count FROM youtube_channel_history WHERE channel_id = %s ORDER BY last_updated DESC LIMIT 1", (channel_id,))
-                    previous_data = cursor.fetchone()
-                    previous_subscribers_count = previous_data[0] if previous_data else 0
-                    growth_rate = ((channel_data["subscribers_count"] - previous_subscribers_count) / previous_subscribers_count * 100
-                                   if previous_subscribers_count > 0 else 0)
-
-                    bot_flag = detect_bot_activity(cursor, channel_id, channel_data['subscribers_count'], 
-                                                   total_likes, total_comments, engagement_rate)
-                    save_channel_data(cursor, channel_data, avg_likes, avg_comments, engagement_rate, growth_rate, total_likes, total_comments, bot_flag)
-                    
-                    for video in post_data:
-                        save_video_data(cursor, video)
-
-        db_connection.commit()
-        time.sleep(3600)  # Prüfen jede Stunde, ob ein Kanal aktualisiert werden muss
-
-    cursor.close()
-    db_connection.close()
+                    # Zuerst in den Spool, dann eine Verbindung aus dem Pool und eine Transaktion pro Kanal
+                    snapshot = spool.save(pool, writer, save_spooled, influencer_id, channel_id, (channel_data, post_data))
+                    # Nächster Abruf nach dem adaptiven Intervall des Kanals; fehlgeschlagene Schreibvorgänge werden nachgeholt
+                    scheduler.reschedule(platform, influencer_id, channel_id, True, snapshot and snapshot['refresh_interval'])
+                else:
+                    scheduler.reschedule(platform, influencer_id, channel_id, False)
+
+        try:
+            writer.flush()
+            refresh_rankings_if_due(pool)
+        except Exception as e:
+            # Gepufferte Zeilen werden beim nächsten Flush erneut geschrieben, ihre Daten bleiben bis dahin im Spool
+            print(f"End-of-cycle write failed, retrying next cycle: {e}")
+            instrumentation.count('errors', 'youtube')
+        print(f"Video writes: {writer.report()}")
+        print(f"History: {channel_changes.report()}, {video_changes.report()}")
+        print(f"Video refreshes: {media_cursors.report()}")
+        print(f"Cache: {cache.report()}")
+        print(f"Quota: {quota.report()}")
+        if cycles == 0:
+            print(f"Startup: {startup_report()}")
+        quota.reset()
+        instrumentation.end_cycle('youtube')
+        cycles += 1
+        if max_cycles and cycles >= max_cycles:
+            break
+        scheduler.wait()  # Schlafen bis der nächste Kanal fällig ist
+
+# Bleibt am Ende des Moduls, damit alle Imports und die Initialisierung mitgemessen werden
+record_startup('import', time.perf_counter() - _import_started)
 
 if __name__ == "__main__":
-    monitor_and_update_data()
+    if '--startup' in sys.argv:
+        # Startzeiten ohne Datenbank messen: Client bauen und einen Kanal abfragen
+        fetch_channel_statistics([arg for arg in sys.argv[1:] if arg != '--startup'] or ['UC_x5XG1OV2P6uZZ5FSM9Ttw'])
+        print(f"Startup: {startup_report()}")
+    else:
+        monitor_and_update_data()